@@ -0,0 +1,282 @@
+"""
+Agrégations calculées directement dans MySQL pour les graphiques de data_visualization.
+
+Au lieu de charger toute la table `produits_clean` dans pandas, chaque fonction exécute un
+GROUP BY (ou une requête avec fonctions de fenêtre) et ne renvoie que le petit résultat dont le
+graphique a besoin : quelques dizaines de lignes, quelle que soit la taille de la table.
+"""
+import math
+from decimal import Decimal
+import pandas as pd
+from db_pool import get_connection
+
+TABLE = "produits_clean"
+NUMERIC_COLUMNS = ("prix", "rating")  # colonnes autorisées pour les histogrammes / classements
+
+
+def query(sql, params=()):
+    """
+    Exécute une requête d'agrégation et renvoie le résultat dans un (petit) DataFrame.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    # DECIMAL (prix, AVG, SUM) -> float pour pandas / matplotlib
+    for column in df.columns:
+        if df[column].map(lambda v: isinstance(v, Decimal)).any():
+            df[column] = df[column].astype(float)
+    return df
+
+
+def _check_column(column):
+    if column not in NUMERIC_COLUMNS:
+        raise ValueError(f"colonne non autorisée : {column}")
+
+
+def summary_stats():
+    """
+    Statistiques globales en une seule requête (nombre de produits, de marques, prix, avis, valeurs manquantes).
+    """
+    return query(f"""
+        SELECT COUNT(*) AS nb_produits,
+               COUNT(DISTINCT marque) AS nb_marques,
+               MIN(prix) AS prix_min, AVG(prix) AS prix_moyen, MAX(prix) AS prix_max,
+               AVG(rating) AS avis_moyen, MAX(rating) AS avis_max,
+               SUM(prix IS NULL) AS prix_manquants,
+               SUM(marque IS NULL OR marque = '') AS marques_manquantes,
+               SUM(infos_livraison = 'non spécifié') AS livraison_non_specifiee
+        FROM {TABLE}
+    """)
+
+
+def brand_counts(top_n=10):
+    """
+    Nombre de produits par marque (les `top_n` marques les plus représentées).
+    """
+    return query(f"""
+        SELECT marque, COUNT(*) AS nb_produits
+        FROM {TABLE}
+        GROUP BY marque
+        ORDER BY nb_produits DESC, marque
+        LIMIT %s
+    """, (top_n,))
+
+
+def histogram(column, bins=20):
+    """
+    Histogramme de `column` (prix ou rating) calculé en SQL : une ligne par intervalle non vide,
+    avec ses bornes et son effectif.
+    """
+    _check_column(column)
+    bounds = query(f"SELECT MIN({column}) AS low, MAX({column}) AS high FROM {TABLE}")
+    low, high = bounds.loc[0, "low"], bounds.loc[0, "high"]
+    if pd.isna(low):
+        return pd.DataFrame(columns=["bucket", "nb_produits", "borne_basse", "borne_haute"])
+    width = (float(high) - float(low)) / bins or 1.0
+    df = query(f"""
+        SELECT LEAST(FLOOR(({column} - %s) / %s), %s) AS bucket, COUNT(*) AS nb_produits
+        FROM {TABLE}
+        WHERE {column} IS NOT NULL
+        GROUP BY bucket
+        ORDER BY bucket
+    """, (float(low), width, bins - 1))
+    df["bucket"] = df["bucket"].astype(int)
+    df["borne_basse"] = float(low) + df["bucket"] * width
+    df["borne_haute"] = df["borne_basse"] + width
+    return df
+
+
+def nearest_rank(values, q):
+    """
+    Quantile `q` au rang le plus proche : la valeur de rang max(1, ceil(n * q)) parmi les n valeurs triées.
+    Même définition que brand_price_quantiles côté SQL, pour que les deux chemins donnent les mêmes quartiles.
+    """
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * q)) - 1]
+
+
+def brand_price_quantiles(top_n=10):
+    """
+    Quartiles des prix pour les `top_n` marques les plus représentées (pour le boxplot).
+    Les rangs sont calculés avec des fonctions de fenêtre sur l'index (marque, prix) ;
+    quartile = valeur au rang le plus proche (voir nearest_rank).
+    """
+    return query(f"""
+        WITH top_marques AS (
+            SELECT marque FROM {TABLE}
+            WHERE prix IS NOT NULL
+            GROUP BY marque
+            ORDER BY COUNT(*) DESC, marque
+            LIMIT %s
+        ),
+        rangs AS (
+            SELECT p.marque, p.prix,
+                   ROW_NUMBER() OVER (PARTITION BY p.marque ORDER BY p.prix) AS rn,
+                   COUNT(*) OVER (PARTITION BY p.marque) AS nb
+            FROM {TABLE} p JOIN top_marques t ON p.marque = t.marque
+            WHERE p.prix IS NOT NULL
+        )
+        SELECT marque, nb AS nb_produits,
+               MIN(prix) AS prix_min,
+               MAX(CASE WHEN rn = GREATEST(1, CEIL(nb * 0.25)) THEN prix END) AS q1,
+               MAX(CASE WHEN rn = GREATEST(1, CEIL(nb * 0.5)) THEN prix END) AS mediane,
+               MAX(CASE WHEN rn = GREATEST(1, CEIL(nb * 0.75)) THEN prix END) AS q3,
+               MAX(prix) AS prix_max
+        FROM rangs
+        GROUP BY marque, nb
+        ORDER BY nb DESC, marque
+    """, (top_n,))
+
+
+def shipping_shares():
+    """
+    Répartition des modes de livraison (effectif et part en %).
+    """
+    return query(f"""
+        SELECT infos_livraison, COUNT(*) AS nb_produits,
+               100 * COUNT(*) / SUM(COUNT(*)) OVER () AS part
+        FROM {TABLE}
+        GROUP BY infos_livraison
+        ORDER BY nb_produits DESC
+    """)
+
+
+def top_products(column="prix", n=5):
+    """
+    Les `n` produits avec la plus grande valeur de `column` (prix ou rating).
+    """
+    _check_column(column)
+    return query(f"""
+        SELECT marque, nom_produit, prix, rating
+        FROM {TABLE}
+        WHERE {column} IS NOT NULL
+        ORDER BY {column} DESC
+        LIMIT %s
+    """, (n,))
+
+
+def price_rating_grid(bins=40):
+    """
+    Nuage prix / nombre d'avis agrégé sur une grille `bins` x `bins` : une ligne par case non vide
+    (centre de la case et nombre de produits), au lieu d'un point par produit.
+    """
+    bounds = query(f"""
+        SELECT MIN(prix) AS prix_min, MAX(prix) AS prix_max, MIN(rating) AS avis_min, MAX(rating) AS avis_max
+        FROM {TABLE} WHERE prix IS NOT NULL
+    """)
+    if bounds.empty or pd.isna(bounds.loc[0, "prix_min"]):
+        return pd.DataFrame(columns=["prix", "rating", "nb_produits"])
+    prix_min, avis_min = float(bounds.loc[0, "prix_min"]), float(bounds.loc[0, "avis_min"])
+    prix_width = (float(bounds.loc[0, "prix_max"]) - prix_min) / bins or 1.0
+    avis_width = (float(bounds.loc[0, "avis_max"]) - avis_min) / bins or 1.0
+    df = query(f"""
+        SELECT LEAST(FLOOR((prix - %s) / %s), %s) AS case_prix,
+               LEAST(FLOOR((rating - %s) / %s), %s) AS case_avis,
+               COUNT(*) AS nb_produits
+        FROM {TABLE}
+        WHERE prix IS NOT NULL
+        GROUP BY case_prix, case_avis
+    """, (prix_min, prix_width, bins - 1, avis_min, avis_width, bins - 1))
+    df["prix"] = prix_min + (df["case_prix"].astype(float) + 0.5) * prix_width
+    df["rating"] = avis_min + (df["case_avis"].astype(float) + 0.5) * avis_width
+    return df[["prix", "rating", "nb_produits"]]
+
+
+def load_report_data(top_n=10, price_bins=20, rating_bins=15):
+    """
+    Toutes les agrégations nécessaires au rapport, dans un dictionnaire de petits DataFrames.
+    """
+    return {
+        "summary": summary_stats(),
+        "brand_counts": brand_counts(top_n),
+        "price_histogram": histogram("prix", price_bins),
+        "rating_histogram": histogram("rating", rating_bins),
+        "brand_price_quantiles": brand_price_quantiles(top_n),
+        "shipping_shares": shipping_shares(),
+        "top_expensive": top_products("prix", 5),
+        "top_rated": top_products("rating", 3),
+        "price_rating_grid": price_rating_grid(),
+    }
+
+
+def report_data_from_frame(df, top_n=10, price_bins=20, rating_bins=15, grid_bins=40):
+    """
+    Mêmes agrégations que load_report_data, calculées en pandas à partir d'un DataFrame déjà chargé
+    (par exemple depuis le stockage Parquet, voir columnar.read_clean).
+    """
+    df = df.assign(prix=df["prix"].astype(float), rating=df["rating"].astype(float))
+    df["marque"] = df["marque"].astype(str)
+    df["infos_livraison"] = df["infos_livraison"].astype(str)
+    priced = df.dropna(subset=["prix"])
+
+    def frame_histogram(values, bins):
+        values = values.dropna()
+        if values.empty:
+            return pd.DataFrame(columns=["bucket", "nb_produits", "borne_basse", "borne_haute"])
+        low = float(values.min())
+        width = (float(values.max()) - low) / bins or 1.0
+        buckets = ((values - low) // width).clip(upper=bins - 1).astype(int)
+        hist = buckets.value_counts().sort_index().rename_axis("bucket").reset_index(name="nb_produits")
+        hist["borne_basse"] = low + hist["bucket"] * width
+        hist["borne_haute"] = hist["borne_basse"] + width
+        return hist
+
+    summary = pd.DataFrame([{
+        "nb_produits": len(df),
+        "nb_marques": df["marque"].nunique(),
+        "prix_min": df["prix"].min(), "prix_moyen": df["prix"].mean(), "prix_max": df["prix"].max(),
+        "avis_moyen": df["rating"].mean(), "avis_max": df["rating"].max(),
+        "prix_manquants": int(df["prix"].isna().sum()),
+        "marques_manquantes": int((df["marque"] == "").sum()),
+        "livraison_non_specifiee": int((df["infos_livraison"] == "non spécifié").sum()),
+    }])
+
+    counts = df.groupby("marque").size().reset_index(name="nb_produits")
+    counts = counts.sort_values(["nb_produits", "marque"], ascending=[False, True]).head(top_n)
+
+    top_brands = (priced.groupby("marque").size().reset_index(name="nb")
+                  .sort_values(["nb", "marque"], ascending=[False, True]).head(top_n)["marque"])
+    quantiles = (priced[priced["marque"].isin(top_brands)].groupby("marque")["prix"]
+                 .agg(nb_produits="size", prix_min="min",
+                      q1=lambda p: nearest_rank(p, 0.25),
+                      mediane=lambda p: nearest_rank(p, 0.5),
+                      q3=lambda p: nearest_rank(p, 0.75),
+                      prix_max="max")
+                 .reset_index().sort_values(["nb_produits", "marque"], ascending=[False, True]))
+
+    shipping = df.groupby("infos_livraison").size().reset_index(name="nb_produits")
+    shipping = shipping.sort_values("nb_produits", ascending=False)
+    shipping["part"] = 100 * shipping["nb_produits"] / shipping["nb_produits"].sum()
+
+    columns = ["marque", "nom_produit", "prix", "rating"]
+    grid = pd.DataFrame(columns=["prix", "rating", "nb_produits"])
+    if not priced.empty:
+        prix_min, avis_min = priced["prix"].min(), priced["rating"].min()
+        prix_width = (priced["prix"].max() - prix_min) / grid_bins or 1.0
+        avis_width = (priced["rating"].max() - avis_min) / grid_bins or 1.0
+        cases = pd.DataFrame({
+            "case_prix": ((priced["prix"] - prix_min) // prix_width).clip(upper=grid_bins - 1),
+            "case_avis": ((priced["rating"] - avis_min) // avis_width).clip(upper=grid_bins - 1),
+        })
+        grid = cases.groupby(["case_prix", "case_avis"]).size().reset_index(name="nb_produits")
+        grid["prix"] = prix_min + (grid["case_prix"] + 0.5) * prix_width
+        grid["rating"] = avis_min + (grid["case_avis"] + 0.5) * avis_width
+        grid = grid[["prix", "rating", "nb_produits"]]
+
+    return {
+        "summary": summary,
+        "brand_counts": counts.reset_index(drop=True),
+        "price_histogram": frame_histogram(df["prix"], price_bins),
+        "rating_histogram": frame_histogram(df["rating"], rating_bins),
+        "brand_price_quantiles": quantiles.reset_index(drop=True),
+        "shipping_shares": shipping.reset_index(drop=True),
+        "top_expensive": priced.nlargest(5, "prix")[columns].reset_index(drop=True),
+        "top_rated": df.nlargest(3, "rating")[columns].reset_index(drop=True),
+        "price_rating_grid": grid,
+    }
@@ -0,0 +1,404 @@
+"""
+Benchmarks hors ligne du pipeline (aucun accès au site Decathlon ni à MySQL).
+
+- Extraction : les pages de listing enregistrées dans fixtures/listing (construites à partir de
+  products.csv) sont servies par un serveur HTTP local puis analysées par fast_scraper.
+- Nettoyage : clean_data sur des tables synthétiques de 1k à 1M lignes (même forme que products.csv).
+- Insertion : bulk_load.upsert_rows (le code d'insertion réel) sur une connexion SQLite en mémoire
+  qui imite la table `produits` ; LOAD DATA y est refusé comme par un serveur sans local_infile.
+- Enrichissement : fiches produit (JSON-LD) servies par un serveur local qui gère ETag et
+  Last-Modified ; téléchargement à froid, relecture du cache, puis revalidation (304).
+
+Les résultats sont écrits en JSON pour pouvoir comparer deux passages :
+    python benchmark.py --output avant.json
+    python benchmark.py --output apres.json --compare avant.json
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from functools import partial
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urljoin, urlparse
+import numpy as np
+import pandas as pd
+import mysql.connector
+import fast_scraper
+import enrichment
+from bulk_load import upsert_rows
+from data_cleaning import clean_data
+from database import PRODUCT_ID_RE, PRODUITS_COLUMNS, parse_price, parse_rating, product_key, product_rows
+
+FIXTURES_DIR = os.path.join("fixtures", "listing")
+PAGE_SIZE = 40
+
+
+# 📌 Fixtures : pages de listing au format Decathlon construites depuis products.csv
+
+def load_products(csv_filename="products.csv"):
+    return pd.read_csv(csv_filename, sep=";", encoding="utf-8-sig", dtype=str).fillna("").to_dict("records")
+
+
+def product_html(p):
+    """
+    Un conteneur `dpb-holder` avec les mêmes classes que sur le site.
+    """
+    rating = p["Rating (nombre d'avis)"]
+    rating = f'<span class="vtmn-rating" title="{html.escape(rating)}"></span>' if rating else ""
+    shipping = f'<p class="dpb-leadtime">{html.escape(p["Infos de livraison"])}</p>' if p["Infos de livraison"] else ""
+    return f"""<div class="dpb-holder" data-supermodelid="1">
+  <a class="dpb-product-model-link" href="{html.escape(p["Lien"])}"><img src="/img.jpg" alt=""></a>
+  <a class="product-title" href="{html.escape(p["Lien"])}"><strong>{html.escape(p["Marque"])}</strong><h2>{html.escape(p["Nom du produit"])}</h2></a>
+  <div class="price-presentation"><span class="vtmn-price vtmn-price_size--medium">{html.escape(p["Prix"])}</span></div>
+  {rating}
+  {shipping}
+</div>"""
+
+
+def build_fixtures(csv_filename="products.csv", fixtures_dir=FIXTURES_DIR, page_size=PAGE_SIZE):
+    """
+    Écrit une page HTML par tranche de `page_size` produits (page-0.html, page-1.html, ...).
+    """
+    products = load_products(csv_filename)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    nb_pages = 0
+    for start in range(0, len(products), page_size):
+        holders = "\n".join(product_html(p) for p in products[start:start + page_size])
+        page = f"""<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>Nouveautés homme | Decathlon</title></head>
+<body><div class="listing">
+{holders}
+</div></body></html>
+"""
+        with open(os.path.join(fixtures_dir, f"page-{start // page_size}.html"), "w", encoding="utf-8") as f:
+            f.write(page)
+        nb_pages += 1
+    return nb_pages
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """
+    Sert /listing?from=X&size=40 à partir de fixtures/listing/page-N.html (N = X / 40).
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        page = int(query.get("from", ["0"])[0]) // int(query.get("size", [str(PAGE_SIZE)])[0])
+        self.path = f"/page-{page}.html"
+        return super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server(directory=FIXTURES_DIR):
+    """
+    Démarre un serveur HTTP local sur un port libre ; renvoie (serveur, URL de base du listing).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(FixtureHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/listing"
+
+
+def detail_html(p):
+    """
+    Fiche produit minimale avec ses données structurées JSON-LD (note, nombre d'avis, tailles et stock).
+    """
+    nb_avis = parse_rating(p["Rating (nombre d'avis)"])
+    seed = int(hashlib.md5(p["Lien"].encode()).hexdigest()[:8], 16)
+    sizes = ["S", "M", "L", "XL"]
+    product = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "name": p["Nom du produit"],
+        "brand": {"@type": "Brand", "name": p["Marque"]},
+        "aggregateRating": {"@type": "AggregateRating", "ratingValue": round(3 + (seed % 200) / 100, 2),
+                            "reviewCount": nb_avis},
+        "offers": [
+            {"@type": "Offer", "size": size, "price": str(parse_price(p["Prix"]) or ""), "priceCurrency": "EUR",
+             "availability": "https://schema.org/" + ("OutOfStock" if (seed >> i) % 3 == 0 else "InStock")}
+            for i, size in enumerate(sizes)
+        ],
+    }
+    return f"""<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>{html.escape(p["Nom du produit"])} | Decathlon</title>
+<script type="application/ld+json">{json.dumps(product, ensure_ascii=False)}</script></head>
+<body><h1>{html.escape(p["Nom du produit"])}</h1></body></html>
+"""
+
+
+class DetailHandler(BaseHTTPRequestHandler):
+    """
+    Sert la fiche de chaque produit à l'adresse de son lien (chemin + paramètres), avec ETag et
+    Last-Modified ; répond 304 aux requêtes conditionnelles si la fiche n'a pas changé.
+    """
+    pages = {}
+    last_modified = "Mon, 05 Oct 2026 08:00:00 GMT"
+
+    def do_GET(self):
+        body = self.pages.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.server.hits += 1
+        if self.headers.get("If-None-Match") == etag or (
+                "If-None-Match" not in self.headers and self.headers.get("If-Modified-Since") == self.last_modified):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_detail_server(products):
+    """
+    Démarre un serveur local de fiches produit ; renvoie (serveur, liste de (clé produit, URL locale)).
+    """
+    pages, links = {}, []
+    for p in products:
+        parsed = urlparse(p["Lien"])
+        path = f"{parsed.path}?{parsed.query}" if parsed.query else parsed.path
+        if path not in pages:
+            pages[path] = detail_html(p).encode()
+            links.append((product_key(p["Lien"]), path))
+    handler = type("FixtureDetailHandler", (DetailHandler,), {"pages": pages})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    return server, [(key, urljoin(base_url, path)) for key, path in links]
+
+
+# 📌 Benchmarks
+
+def bench_extraction(base_url, nb_pages, repeat=3):
+    """
+    Téléchargement + analyse de chaque page (HTTP local), puis analyse seule du HTML.
+    """
+    session = fast_scraper.create_session()
+    fetch_times, parse_times, nb_products = [], [], 0
+    for _ in range(repeat):
+        for page_num in range(nb_pages):
+            url = fast_scraper.listing_url(base_url, page_num, PAGE_SIZE)
+            start = time.perf_counter()
+            response = session.get(url, timeout=10)
+            response.encoding = "utf-8"
+            fetched = time.perf_counter()
+            products = fast_scraper.parse_listing(response.text, url)
+            parse_times.append(time.perf_counter() - fetched)
+            fetch_times.append(fetched - start)
+            nb_products += len(products or [])
+    session.close()
+    return {
+        "pages": len(parse_times),
+        "products": nb_products,
+        "fetch_ms_per_page": 1000 * float(np.median(fetch_times)),
+        "parse_ms_per_page": 1000 * float(np.median(parse_times)),
+        "products_per_s": nb_products / (sum(fetch_times) + sum(parse_times)),
+    }
+
+
+def synthetic_table(products, nb_rows, seed=0):
+    """
+    Table `produits` synthétique de `nb_rows` lignes tirées de products.csv (clés produit uniques).
+    """
+    rng = np.random.default_rng(seed)
+    base = pd.DataFrame(products)
+    sample = base.iloc[rng.integers(0, len(base), nb_rows)].reset_index(drop=True)
+    return pd.DataFrame({
+        "id": np.arange(1, nb_rows + 1),
+        "product_key": "R-p-" + pd.Series(np.arange(nb_rows)).astype(str),
+        "marque": sample["Marque"],
+        "nom_produit": sample["Nom du produit"],
+        "lien": sample["Lien"],
+        "prix": sample["Prix"],
+        "rating": sample["Rating (nombre d'avis)"],
+        "infos_livraison": sample["Infos de livraison"],
+    })
+
+
+def bench_cleaning(products, sizes, chunksize=50_000):
+    results = {}
+    for nb_rows in sizes:
+        table = synthetic_table(products, nb_rows)
+        start = time.perf_counter()
+        for offset in range(0, nb_rows, chunksize):
+            clean_data(table.iloc[offset:offset + chunksize].copy(), verbose=False)
+        duration = time.perf_counter() - start
+        results[str(nb_rows)] = {"seconds": duration, "rows_per_s": nb_rows / duration}
+        print(f"🧹 Nettoyage {nb_rows} lignes : {duration:.3f}s ({nb_rows / duration:.0f} lignes/s)")
+    return results
+
+
+class SQLiteCursor:
+    """
+    Curseur SQLite qui accepte le SQL MySQL produit par bulk_load (paramètres %s, ON DUPLICATE KEY
+    UPDATE). LOAD DATA LOCAL INFILE est refusé avec l'erreur MySQL 1148, comme par un serveur
+    sans local_infile : upsert_rows revient alors à executemany.
+    """
+
+    def __init__(self, conn):
+        self.cursor = conn.cursor()
+
+    @staticmethod
+    def translate(sql):
+        if "LOAD DATA" in sql:
+            raise mysql.connector.Error("LOAD DATA LOCAL INFILE indisponible sur SQLite", errno=1148)
+        sql = sql.replace("%s", "?").replace("DROP TEMPORARY TABLE", "DROP TABLE")
+        sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+        return re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(self.translate(sql), params)
+
+    def executemany(self, sql, rows):
+        self.cursor.executemany(self.translate(sql), rows)
+
+
+def bench_insert(products, nb_rows, batch_size=500):
+    """
+    Upsert de `nb_rows` produits distincts (un identifiant R-p- par ligne) : lignes construites par
+    database.product_rows et écrites par bulk_load.upsert_rows, comme dans insert_into_mysql.
+    """
+    table = synthetic_table(products, nb_rows)
+    data = [
+        {"Marque": r.marque, "Nom du produit": r.nom_produit, "Prix": r.prix,
+         "Lien": PRODUCT_ID_RE.sub(f"R-p-{r.id}", r.lien) if PRODUCT_ID_RE.search(r.lien) else f"{r.lien}/_/R-p-{r.id}",
+         "Rating (nombre d'avis)": r.rating, "Infos de livraison": r.infos_livraison}
+        for r in table.itertuples()
+    ]
+    sqlite3.register_adapter(Decimal, str)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE produits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, product_key TEXT UNIQUE, marque TEXT, nom_produit TEXT,
+            lien TEXT, prix NUMERIC, rating INTEGER, infos_livraison TEXT
+        )
+    """)
+    start = time.perf_counter()
+    rows = product_rows(data)
+    method = upsert_rows(SQLiteCursor(conn), "produits", PRODUITS_COLUMNS, rows, batch_size)
+    conn.commit()
+    duration = time.perf_counter() - start
+    distinct = conn.execute("SELECT COUNT(*) FROM produits").fetchone()[0]
+    conn.close()
+    print(f"💾 Insertion {nb_rows} lignes ({distinct} produits distincts, {method}) : "
+          f"{duration:.3f}s ({nb_rows / duration:.0f} lignes/s)")
+    return {"rows": nb_rows, "distinct": distinct, "method": method, "seconds": duration,
+            "rows_per_s": nb_rows / duration}
+
+
+def bench_enrichment(products, max_workers=8):
+    """
+    Enrichissement sans MySQL : premier passage (cache vide), deuxième passage (cache frais, aucune
+    requête), troisième passage avec un TTL nul (revalidation : que des 304).
+    """
+    server, links = start_detail_server(products)
+    cache_dir = tempfile.mkdtemp(prefix="cache_http_")
+    results = {}
+    try:
+        for name, ttl in (("cold", 3600), ("cached", 3600), ("revalidate", 0)):
+            hits = server.hits
+            start = time.perf_counter()
+            rows, stats = enrichment.enrich(links, max_workers=max_workers, to_mysql=False, rate=1000, burst=100,
+                                            cache=enrichment.HttpCache(cache_dir, ttl=ttl))
+            duration = time.perf_counter() - start
+            results[name] = {"products": len(rows), "seconds": duration, "requests": server.hits - hits,
+                             "products_per_s": len(rows) / duration, **stats}
+            print(f"🔎 Enrichissement ({name}) : {len(rows)} fiches en {duration:.3f}s, "
+                  f"{server.hits - hits} requêtes au serveur")
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+# 📌 Comparaison de deux passages
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current, previous):
+    """
+    Affiche, pour chaque mesure commune, l'ancienne valeur, la nouvelle et le rapport nouvelle / ancienne.
+    """
+    old, new = flatten(previous["results"]), flatten(current["results"])
+    print(f"\n{'mesure':<45} {'avant':>12} {'après':>12} {'rapport':>8}")
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name] / old[name] if old[name] else float("nan")
+        print(f"{name:<45} {old[name]:>12.3f} {new[name]:>12.3f} {ratio:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne du scraping, du nettoyage et de l'insertion")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="tailles des tables de nettoyage")
+    parser.add_argument("--insert-rows", type=int, default=100_000, help="nombre de lignes insérées")
+    parser.add_argument("--output", default="bench_results.json", help="fichier JSON des résultats")
+    parser.add_argument("--compare", help="fichier JSON d'un passage précédent à comparer")
+    parser.add_argument("--rebuild-fixtures", action="store_true", help="régénérer fixtures/listing depuis products.csv")
+    args = parser.parse_args()
+
+    if args.rebuild_fixtures or not os.path.isdir(FIXTURES_DIR):
+        print(f"🛠 {build_fixtures()} pages de fixtures générées dans {FIXTURES_DIR}.")
+    nb_pages = len([name for name in os.listdir(FIXTURES_DIR) if name.startswith("page-")])
+
+    products = load_products()
+    server, base_url = start_fixture_server()
+    try:
+        extraction = bench_extraction(base_url, nb_pages)
+        print(f"🌐 Extraction : {extraction['fetch_ms_per_page']:.1f} ms de téléchargement + "
+              f"{extraction['parse_ms_per_page']:.1f} ms d'analyse par page")
+    finally:
+        server.shutdown()
+
+    results = {
+        "extraction": extraction,
+        "cleaning": bench_cleaning(products, [int(size) for size in args.sizes.split(",")]),
+        "insert": bench_insert(products, args.insert_rows),
+        "enrichment": bench_enrichment(products),
+    }
+    report = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📂 Résultats enregistrés dans {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Profil navigateur « léger » pour le scraping Selenium.
+
+- Navigateur sans fenêtre (headless), chargement « eager » (on n'attend pas les sous-ressources :
+  la grille de produits est attendue par PageWaiter).
+- Images, vidéos, polices et domaines de tracking bloqués via le protocole DevTools
+  (Network.setBlockedURLs) : ils ne sont jamais téléchargés.
+- Profil persistant (`profils/<navigateur>-N`) : le consentement cookies et le cache HTTP
+  sont conservés d'un passage à l'autre.
+- Une session partagée « préchauffée » (page d'accueil chargée, bannière cookies traitée) que
+  scrape_all_pages réutilise d'un appel à l'autre au lieu de relancer un navigateur.
+"""
+import atexit
+import itertools
+import os
+import threading
+from selenium import webdriver
+from waits import PageWaiter
+
+PROFILE_DIR = "profils"
+
+BLOCKED_URL_PATTERNS = [
+    # Images et vidéos
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.mp4", "*.webm", "*.m3u8",
+    # Polices
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    # Tracking / publicité
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+    "*hotjar.com*", "*criteo.com*", "*criteo.net*", "*contentsquare.net*", "*bing.com/bat*",
+    "*tiktok.com*", "*pinterest.com*",
+]
+
+BROWSERS = {
+    "edge": (webdriver.EdgeOptions, webdriver.Edge),
+    "chrome": (webdriver.ChromeOptions, webdriver.Chrome),
+}
+
+
+def create_lean_driver(browser="edge", headless=True, profile_dir=None, block_resources=True):
+    """
+    Instancie un WebDriver Edge ou Chrome en mode léger. `profile_dir` : dossier de profil
+    persistant (None = profil temporaire). Un profil ne peut être ouvert que par un navigateur à la fois.
+    """
+    options_class, driver_class = BROWSERS[browser]
+    options = options_class()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1366,900")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--mute-audio")
+    options.add_argument("--no-first-run")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.page_load_strategy = "eager"
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
+
+    driver = driver_class(options=options)
+    if block_resources:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            print("⚠ Blocage des ressources impossible (DevTools indisponible) :", e)
+    return driver
+
+
+def lean_driver_factory(browser="edge", headless=True, profile_dir=PROFILE_DIR):
+    """
+    Fabrique de drivers légers pour les workers du crawl concurrent : chaque appel reçoit son
+    propre profil persistant (`<browser>-1`, `<browser>-2`, ...), réutilisé au passage suivant.
+    """
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    def factory():
+        with lock:
+            number = next(counter)
+        return create_lean_driver(browser, headless, os.path.join(profile_dir, f"{browser}-{number}"))
+
+    return factory
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_session(warm_up_url, browser="edge", headless=True, profile_dir=PROFILE_DIR):
+    """
+    Renvoie (driver, waiter) d'une session légère partagée par le processus. Au premier appel,
+    le navigateur est démarré puis préchauffé : `warm_up_url` est chargée et la bannière cookies
+    traitée. Les appels suivants réutilisent la même session. Fermée automatiquement à la sortie.
+    """
+    with _shared_lock:
+        if browser not in _shared:
+            driver = create_lean_driver(browser, headless, os.path.join(profile_dir, f"{browser}-shared"))
+            waiter = PageWaiter(driver)
+            driver.get(warm_up_url)
+            waiter.wait_for_products()
+            waiter.close_cookie_banner()
+            _shared[browser] = (driver, waiter)
+            print(f"🔥 Session {browser} préchauffée.")
+        return _shared[browser]
+
+
+def close_shared_sessions():
+    with _shared_lock:
+        for driver, waiter in _shared.values():
+            waiter.print_summary()
+            driver.quit()
+        _shared.clear()
+
+
+atexit.register(close_shared_sessions)
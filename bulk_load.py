@@ -0,0 +1,191 @@
+"""
+Chargement en masse dans MySQL avec LOAD DATA LOCAL INFILE.
+
+Les lignes sont écrites dans un fichier délimité (ou on réutilise un CSV déjà écrit, par exemple
+cleaned_products.csv) puis chargées d'un seul bloc dans une table de staging temporaire.
+Le staging est ensuite fusionné dans la table cible en une seule instruction
+(INSERT ... SELECT ... ON DUPLICATE KEY UPDATE), ou chargé directement dans une table neuve
+que l'appelant échange ensuite avec RENAME TABLE.
+
+Les petits lots passent toujours par executemany. Si le serveur refuse LOAD DATA LOCAL
+(local_infile désactivé), on revient à executemany pour le reste du processus.
+"""
+import csv
+import os
+import tempfile
+import mysql.connector
+import pandas as pd
+
+# En dessous de ce nombre de lignes, executemany est plus rapide que d'écrire puis charger un fichier
+BULK_MIN_ROWS = int(os.environ.get("MYSQL_BULK_MIN_ROWS", "5000"))
+
+# Colonnes où un champ vide du fichier signifie NULL (clé unique, colonnes numériques facultatives)
+NULL_IF_EMPTY = ("product_key", "prix", "note_moyenne", "nb_avis", "en_stock")
+
+# Erreurs MySQL quand LOAD DATA LOCAL est refusé par le client ou le serveur
+LOCAL_INFILE_ERRORS = (1148, 2068, 3948)
+
+_local_infile_ok = os.environ.get("MYSQL_LOCAL_INFILE", "1") != "0"
+
+
+def bulk_available(nb_rows):
+    return _local_infile_ok and nb_rows >= BULK_MIN_ROWS
+
+
+def upsert_sql(table, columns, key="product_key"):
+    updates = ",\n        ".join(f"{c} = VALUES({c})" for c in columns if c != key)
+    return f"""
+    INSERT INTO {table} ({", ".join(columns)})
+    VALUES ({", ".join(["%s"] * len(columns))})
+    ON DUPLICATE KEY UPDATE
+        {updates}
+    """
+
+
+def write_load_file(rows, columns):
+    """
+    Écrit les lignes (tuples) dans un fichier CSV temporaire (séparateur `;`, en-tête) ; renvoie son chemin.
+    """
+    fd, path = tempfile.mkstemp(prefix="bulk_", suffix=".csv")
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";", lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(("" if value is None else value for value in row) for row in rows)
+    return path
+
+
+def write_frame_file(df, columns):
+    """
+    Même chose pour un DataFrame, sans passer par une liste Python intermédiaire.
+    """
+    fd, path = tempfile.mkstemp(prefix="bulk_", suffix=".csv")
+    os.close(fd)
+    df[columns].to_csv(path, sep=";", index=False, encoding="utf-8", lineterminator="\n")
+    return path
+
+
+def load_file(cursor, path, table, columns, sep=";"):
+    """
+    Charge un CSV avec en-tête (écrit par write_load_file ou par pandas) dans `table`.
+    Les colonnes sont associées par nom d'en-tête ; celles qui ne sont pas dans `columns` sont ignorées.
+    Le BOM (utf-8-sig) et les fins de ligne Windows sont tolérés.
+    Renvoie le nombre de lignes chargées.
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f, delimiter=sep))
+
+    variables, assignments = [], []
+    for i, name in enumerate(header):
+        name = name.strip()
+        variables.append(f"@c{i}")
+        if name not in columns:
+            continue
+        expression = f"@c{i}"
+        if i == len(header) - 1:
+            expression = f"TRIM(TRAILING '\\r' FROM {expression})"
+        if name in NULL_IF_EMPTY:
+            expression = f"NULLIF({expression}, '')"
+        assignments.append(f"{name} = {expression}")
+
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY '{sep}' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 LINES
+        ({", ".join(variables)})
+        SET {", ".join(assignments)}
+    """, (os.path.abspath(path),))
+    return cursor.rowcount
+
+
+def merge_file(cursor, path, table, columns, key="product_key"):
+    """
+    Charge le fichier dans une table de staging temporaire (sans index), puis le fusionne dans
+    `table` en une seule instruction : les lignes existantes (même `key`) sont mises à jour.
+    """
+    staging = f"{table}_staging"
+    column_list = ", ".join(columns)
+    updates = ", ".join(f"{c} = VALUES({c})" for c in columns if c != key)
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+    cursor.execute(f"CREATE TEMPORARY TABLE {staging} AS SELECT {column_list} FROM {table} LIMIT 0")
+    try:
+        nb_rows = load_file(cursor, path, staging, columns)
+        cursor.execute(f"""
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list} FROM {staging}
+            ON DUPLICATE KEY UPDATE {updates}
+        """)
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+    return nb_rows
+
+
+def _disable_on_refusal(e):
+    """
+    Si le serveur refuse LOAD DATA LOCAL, on ne le retente plus ; toute autre erreur est relancée.
+    """
+    global _local_infile_ok
+    if e.errno not in LOCAL_INFILE_ERRORS:
+        raise e
+    _local_infile_ok = False
+    print(f"⚠ LOAD DATA LOCAL INFILE refusé ({e.msg}) : retour à executemany.")
+
+
+def upsert_rows(cursor, table, columns, rows, batch_size=500, key="product_key"):
+    """
+    Upsert de `rows` (tuples dans l'ordre de `columns`) : chargement en masse au-delà de
+    BULK_MIN_ROWS lignes, executemany par lots sinon. Renvoie la méthode utilisée.
+    """
+    if bulk_available(len(rows)):
+        path = write_load_file(rows, columns)
+        try:
+            merge_file(cursor, path, table, columns, key)
+            return "load_data"
+        except mysql.connector.Error as e:
+            _disable_on_refusal(e)
+        finally:
+            os.remove(path)
+
+    sql = upsert_sql(table, columns, key)
+    for offset in range(0, len(rows), batch_size):
+        cursor.executemany(sql, rows[offset:offset + batch_size])
+    return "executemany"
+
+
+def upsert_frame(cursor, table, df, columns, batch_size=500, key="product_key"):
+    """
+    Version DataFrame de upsert_rows (le fichier est écrit directement par pandas).
+    """
+    if bulk_available(len(df)):
+        path = write_frame_file(df, columns)
+        try:
+            merge_file(cursor, path, table, columns, key)
+            return "load_data"
+        except mysql.connector.Error as e:
+            _disable_on_refusal(e)
+        finally:
+            os.remove(path)
+
+    rows = df[columns].astype(object).where(df[columns].notna(), None).values.tolist()
+    return upsert_rows(cursor, table, columns, rows, batch_size, key) if rows else "executemany"
+
+
+def load_csv_or_upsert(cursor, path, table, columns, nb_rows, df=None, chunksize=50_000):
+    """
+    Remplit une table neuve (avant échange par RENAME TABLE) à partir d'un CSV déjà écrit à `path`
+    (`nb_rows` lignes). Si le lot est petit ou si LOAD DATA est refusé, les lignes sont upsertées
+    depuis `df` ou, à défaut, en relisant le CSV par morceaux.
+    """
+    if bulk_available(nb_rows):
+        try:
+            load_file(cursor, path, table, columns)
+            return "load_data"
+        except mysql.connector.Error as e:
+            _disable_on_refusal(e)
+    if df is not None:
+        return upsert_frame(cursor, table, df, columns)
+    for chunk in pd.read_csv(path, sep=";", encoding="utf-8-sig", usecols=columns, chunksize=chunksize,
+                             dtype={"product_key": str}):
+        upsert_frame(cursor, table, chunk, columns)
+    return "executemany"
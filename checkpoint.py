@@ -0,0 +1,120 @@
+"""
+Reprise du crawl après interruption et nouvelles tentatives en cas d'échec.
+
+Chaque page terminée (son offset `from` et ses produits) est ajoutée à un fichier d'état JSON lines.
+L'écriture est faite en ajout, ligne par ligne, avec fsync : une interruption ne peut abîmer que la
+dernière ligne, qui est alors ignorée. Au passage suivant, les pages déjà présentes sont relues
+depuis le fichier au lieu d'être rechargées. Le fichier est supprimé quand un crawl se termine sans
+page manquante (le crawl suivant repart de zéro), et ignoré s'il est plus ancien que MAX_AGE : un
+crawl abandonné la veille n'est pas mélangé à un catalogue qui a changé depuis.
+"""
+import json
+import os
+import random
+import time
+
+STATE_FILE = "crawl_state.jsonl"
+MAX_AGE = 24 * 3600  # secondes
+
+
+def retry_with_backoff(func, retries=4, base_delay=1.0, max_delay=30.0, description="opération"):
+    """
+    Appelle func() ; en cas d'exception, réessaie jusqu'à `retries` fois en attendant
+    base_delay * 2^n secondes (plafonné à max_delay) avec un jitter aléatoire (« full jitter »).
+    La dernière exception est relancée si toutes les tentatives échouent.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"🔁 {description} : échec ({e}), nouvelle tentative {attempt + 1}/{retries} dans {delay:.1f}s.")
+            time.sleep(delay)
+
+
+class CrawlCheckpoint:
+    """
+    État persistant d'un crawl : offsets des pages terminées et leurs produits.
+    Le fichier n'est repris que s'il correspond au même listing (URL de base et taille de page)
+    et que le crawl a commencé il y a moins de `max_age` secondes (date `started_at` de l'en-tête).
+    """
+
+    def __init__(self, path=STATE_FILE, base_url="", page_size=40, restart=False, max_age=MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.header = {"base_url": base_url, "page_size": page_size, "started_at": time.time()}
+        self.pages = {}  # offset -> produits
+        self.failed = set()
+        if restart and os.path.exists(path):
+            os.remove(path)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else None
+        except json.JSONDecodeError:
+            header = None
+        if not isinstance(header, dict) or any(header.get(k) != self.header[k] for k in ("base_url", "page_size")):
+            print(f"ℹ Fichier d'état {self.path} d'un autre crawl : on repart de zéro.")
+            os.remove(self.path)
+            return
+        age = time.time() - header.get("started_at", 0)
+        if age > self.max_age:
+            print(f"ℹ Fichier d'état {self.path} commencé il y a {age / 3600:.0f} h : on repart de zéro.")
+            os.remove(self.path)
+            return
+        self.header = header
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # Dernière ligne tronquée par une interruption
+            self.pages[entry["from"]] = entry["products"]
+        if self.pages:
+            print(f"♻ Reprise du crawl : {len(self.pages)} pages déjà récupérées dans {self.path}.")
+
+    def _append(self, entry):
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if new_file:
+                f.write(json.dumps(self.header) + "\n")
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def offset(self, page_num):
+        return page_num * self.header["page_size"]
+
+    def page_nums(self):
+        return sorted(offset // self.header["page_size"] for offset in self.pages)
+
+    def has(self, page_num):
+        return self.offset(page_num) in self.pages
+
+    def products(self, page_num):
+        return self.pages[self.offset(page_num)]
+
+    def save_page(self, page_num, products):
+        offset = self.offset(page_num)
+        self._append({"from": offset, "products": products})
+        self.pages[offset] = products
+        self.failed.discard(page_num)
+
+    def mark_failed(self, page_num):
+        self.failed.add(page_num)
+
+    def finish(self):
+        """
+        Fin du crawl : supprime l'état si aucune page n'a échoué, sinon le garde pour la reprise.
+        """
+        if self.failed:
+            pages = ", ".join(str(p + 1) for p in sorted(self.failed))
+            print(f"⚠ Pages manquantes : {pages}. Relancer le scraping pour les récupérer ({self.path}).")
+        elif os.path.exists(self.path):
+            os.remove(self.path)
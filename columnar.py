@@ -0,0 +1,160 @@
+"""
+Stockage en colonnes (Parquet / Arrow) à côté des exports CSV.
+
+- Données brutes : un jeu de données Parquet partitionné par passage de scraping
+  (`donnees/produits/run_date=AAAA-MM-JJ/run_id=.../part-N.parquet`).
+- Données nettoyées : un fichier `donnees/produits_clean.parquet`.
+
+Marque et mode de livraison sont encodés en dictionnaire (peu de valeurs distinctes), prix et
+rating sont typés. La lecture se fait avec projection de colonnes et memory-mapping, sans
+repasser par MySQL ni par l'analyse du texte des CSV.
+"""
+import os
+import time
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from database import parse_price, parse_rating, product_key
+
+RAW_DIR = os.path.join("donnees", "produits")
+CLEAN_PATH = os.path.join("donnees", "produits_clean.parquet")
+DICTIONARY_COLUMNS = ["marque", "infos_livraison"]
+PARTITION_COLUMNS = ["run_date", "run_id"]  # Ajoutées à la lecture par le partitionnement hive
+
+RAW_SCHEMA = pa.schema([
+    ("product_key", pa.string()),
+    ("marque", pa.dictionary(pa.int32(), pa.string())),
+    ("nom_produit", pa.string()),
+    ("lien", pa.string()),
+    ("prix", pa.float32()),
+    ("rating", pa.int32()),
+    ("infos_livraison", pa.dictionary(pa.int32(), pa.string())),
+])
+
+
+def new_run_id():
+    return time.strftime("%Y%m%dT%H%M%S")
+
+
+def records_to_table(data):
+    """
+    Convertit les dictionnaires du scraper en table Arrow typée (mêmes colonnes que la table `produits`).
+    """
+    columns = {
+        "product_key": [product_key(p["Lien"], p["Marque"], p["Nom du produit"]) for p in data],
+        "marque": [p["Marque"] for p in data],
+        "nom_produit": [p["Nom du produit"] for p in data],
+        "lien": [p["Lien"] for p in data],
+        "prix": [None if (prix := parse_price(p["Prix"])) is None else float(prix) for p in data],
+        "rating": [parse_rating(p["Rating (nombre d'avis)"]) for p in data],
+        "infos_livraison": [p["Infos de livraison"] for p in data],
+    }
+    arrays = [
+        pa.array(columns[field.name], type=field.type.value_type).dictionary_encode()
+        if pa.types.is_dictionary(field.type) else pa.array(columns[field.name], type=field.type)
+        for field in RAW_SCHEMA
+    ]
+    return pa.Table.from_arrays(arrays, schema=RAW_SCHEMA)
+
+
+def write_run(data, run_id=None, part=0, base_dir=RAW_DIR):
+    """
+    Écrit un lot de produits scrappés dans la partition du passage `run_id` (un fichier par lot).
+    Renvoie le chemin du fichier écrit.
+    """
+    run_id = run_id or new_run_id()
+    run_date = f"{run_id[:4]}-{run_id[4:6]}-{run_id[6:8]}"
+    partition = os.path.join(base_dir, f"run_date={run_date}", f"run_id={run_id}")
+    os.makedirs(partition, exist_ok=True)
+    path = os.path.join(partition, f"part-{part}.parquet")
+    pq.write_table(records_to_table(data), path, compression="zstd", use_dictionary=DICTIONARY_COLUMNS)
+    return path
+
+
+def latest_run_id(base_dir=RAW_DIR):
+    """
+    Identifiant du passage de scraping le plus récent (les identifiants sont des horodatages triables).
+    """
+    run_ids = [
+        name.split("=", 1)[1]
+        for _, dirs, _ in os.walk(base_dir)
+        for name in dirs if name.startswith("run_id=")
+    ]
+    return max(run_ids) if run_ids else None
+
+
+def read_runs(columns=None, run_id=None, base_dir=RAW_DIR):
+    """
+    Lit les données brutes (toutes les partitions, ou seulement le passage `run_id`) en ne
+    chargeant que les colonnes demandées. Renvoie une table Arrow.
+    """
+    dataset = ds.dataset(base_dir, format="parquet", partitioning="hive")
+    filter_expression = ds.field("run_id") == run_id if run_id else None
+    return dataset.to_table(columns=columns, filter=filter_expression)
+
+
+def iter_run_batches(columns=None, run_id=None, batch_size=50_000, base_dir=RAW_DIR):
+    """
+    Lit les données brutes par lots (DataFrames pandas), pour le nettoyage par morceaux.
+    Les colonnes de partition (run_date, run_id) ne sont pas renvoyées : ce ne sont pas des colonnes produit.
+    """
+    dataset = ds.dataset(base_dir, format="parquet", partitioning="hive")
+    filter_expression = ds.field("run_id") == run_id if run_id else None
+    for batch in dataset.to_batches(columns=columns, filter=filter_expression, batch_size=batch_size):
+        yield batch.to_pandas().drop(columns=PARTITION_COLUMNS, errors="ignore")
+
+
+class CleanParquetWriter:
+    """
+    Écrit les morceaux nettoyés les uns après les autres dans un seul fichier Parquet
+    (fichier temporaire renommé à la fermeture : les lecteurs ne voient jamais un fichier incomplet).
+    """
+
+    def __init__(self, path=CLEAN_PATH):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.writer = None
+        self.schema = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            # Index des dictionnaires fixés en int32 : les catégories des morceaux suivants peuvent être plus nombreuses
+            self.schema = pa.schema([
+                pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type))
+                if pa.types.is_dictionary(field.type) else field
+                for field in table.schema
+            ])
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema, compression="zstd",
+                                           use_dictionary=DICTIONARY_COLUMNS)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            os.remove(self.tmp_path)
+
+
+def write_clean(df, path=CLEAN_PATH):
+    """
+    Écrit les données nettoyées (d'un seul bloc) dans `path`.
+    """
+    writer = CleanParquetWriter(path)
+    writer.write(df)
+    writer.close()
+
+
+def read_clean(columns=None, path=CLEAN_PATH):
+    """
+    Charge les données nettoyées avec projection de colonnes et memory-mapping.
+    Les colonnes encodées en dictionnaire redeviennent des catégories pandas.
+    """
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
@@ -1,138 +1,378 @@
+import time
 import mysql.connector
 import pandas as pd
+from db_pool import get_connection, print_pool_stats
+import columnar
+from bulk_load import load_csv_or_upsert, upsert_frame
+from dedup import assign_canonical_ids, product_id
+import metrics
 
-# 📌 Connexion à MySQL et chargement des données brutes
-def load_data_from_mysql():
+CLEAN_COLUMNS = ["product_key", "marque", "nom_produit", "lien", "prix", "rating", "infos_livraison"]
+
+# Même schéma que celui produit par les migrations (migrations.py)
+CLEAN_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        product_key VARCHAR(64),
+        canonical_id VARCHAR(64),
+        marque VARCHAR(255),
+        nom_produit VARCHAR(255),
+        lien TEXT,
+        prix DECIMAL(10,2),
+        rating INT NOT NULL DEFAULT 0,
+        infos_livraison VARCHAR(255) DEFAULT 'non spécifié',
+        UNIQUE KEY uq_produits_clean_product_key (product_key),
+        KEY idx_produits_clean_marque_prix (marque, prix),
+        KEY idx_produits_clean_prix (prix),
+        KEY idx_produits_clean_livraison (infos_livraison),
+        KEY idx_produits_clean_canonical (canonical_id)
+    )
+"""
+
+
+# 📌 Point de reprise (high-water mark) du nettoyage incrémental
+def get_watermark(stage="clean"):
     """
-    Je récupère les données brutes depuis MySQL et les charge dans un DataFrame Pandas.
+    Je récupère la date de mise à jour la plus récente déjà traitée par l'étape `stage`
+    (None si l'étape n'a jamais tourné : il faut alors tout traiter).
     """
-    try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="mamadou",  # Mon mot de passe MySQL
-            database="scraping_db"
-        )
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT last_updated_at FROM etl_watermarks WHERE stage = %s", (stage,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+    return row[0] if row else None
 
-        # J'exécute une requête pour récupérer tous les produits
-        query = "SELECT * FROM produits"
-        df = pd.read_sql(query, conn)
 
-        conn.close()
-        print("✅ Données chargées depuis MySQL.")
-        return df
+def set_watermark(cursor, last_updated_at, stage="clean"):
+    """
+    J'enregistre le nouveau point de reprise (dans la même transaction que l'écriture des données).
+    """
+    cursor.execute("""
+        INSERT INTO etl_watermarks (stage, last_updated_at) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE last_updated_at = VALUES(last_updated_at)
+    """, (stage, last_updated_at))
 
-    except mysql.connector.Error as e:
-        print(f"❌ Erreur MySQL : {e}")
-        return None
+
+def server_time():
+    """
+    J'interroge l'heure du serveur MySQL (la même horloge que `produits.updated_at`).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT NOW()")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+
+def pending_changes(since, until):
+    """
+    Je compte les lignes de `produits` modifiées depuis `since` (None : depuis toujours) et avant `until`,
+    et je renvoie aussi la date de mise à jour la plus récente de la table.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if since is None:
+                cursor.execute("SELECT COUNT(*) FROM produits WHERE updated_at < %s", (until,))
+            else:
+                cursor.execute("SELECT COUNT(*) FROM produits WHERE updated_at >= %s AND updated_at < %s", (since, until))
+            pending = cursor.fetchone()[0]
+            cursor.execute("SELECT MAX(updated_at) FROM produits")
+            return pending, cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+
+# 📌 Lecture des données brutes par morceaux (mémoire bornée)
+def iter_raw_chunks(since=None, chunksize=50_000):
+    """
+    Je lis la table `produits` par morceaux de `chunksize` lignes (curseur non bufferisé :
+    les lignes restent côté serveur jusqu'au fetchmany) et je renvoie un DataFrame par morceau.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if since is None:
+                cursor.execute("SELECT * FROM produits")
+            else:
+                cursor.execute("SELECT * FROM produits WHERE updated_at >= %s", (since,))
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns)
+        finally:
+            cursor.close()
 
 
 # 📌 Nettoyage des données pour les rendre exploitables
-def clean_data(df):
+def clean_data(df, verbose=True):
     """
     Ici, je nettoie les données du DataFrame pour éviter les erreurs et les incohérences :
-    - Suppression des doublons
+    - Suppression des doublons (uniquement pour les données sans clé produit)
     - Suppression des espaces inutiles
     - Conversion en minuscules pour standardiser
-    - Nettoyage des prix en convertissant en float
-    - Remplacement des valeurs nulles et vides dans rating et infos_livraison
+    - Nettoyage des prix en convertissant en float32
+    - Remplacement des valeurs nulles et vides dans rating (entier) et infos_livraison
+    - Marque et infos de livraison stockées en catégories (peu de valeurs distinctes)
+    Toutes les opérations sont vectorisées, ce qui permet de nettoyer un morceau à la fois.
     """
-    print("🔄 Nettoyage des données en cours...")
+    if verbose:
+        print("🔄 Nettoyage des données en cours...")
 
-    # Suppression des doublons (je me base sur le nom du produit)
-    df.drop_duplicates(subset=["nom_produit"], inplace=True)
+    # Les doublons sont déjà évités à l'insertion (clé produit unique dans `produits`) :
+    # je ne dédoublonne sur le nom que pour d'anciennes données sans clé produit
+    if "product_key" not in df.columns:
+        df.drop_duplicates(subset=["nom_produit"], inplace=True)
 
     # Je supprime les espaces inutiles et mets tout en minuscules pour normaliser
-    df["marque"] = df["marque"].str.strip().str.lower()
-    df["nom_produit"] = df["nom_produit"].str.strip().str.lower()
+    df["marque"] = df["marque"].astype("string").str.strip().str.lower().astype("category")
+    df["nom_produit"] = df["nom_produit"].astype("string").str.strip().str.lower()
 
-    # ⚠️ Correction : Remplacement des valeurs NULL ou vides avant de normaliser
-    df["infos_livraison"] = df["infos_livraison"].fillna("").astype(str)  # Conversion en string obligatoire
-    df["infos_livraison"] = df["infos_livraison"].replace("", "non spécifié")  # Je remplace les champs vides
-    df["infos_livraison"] = df["infos_livraison"].str.strip()  # Nettoyage des espaces
+    # ⚠️ Remplacement des valeurs NULL ou vides (après suppression des espaces)
+    shipping = df["infos_livraison"].astype("string").str.strip().fillna("")
+    df["infos_livraison"] = shipping.mask(shipping == "", "non spécifié").astype("category")
 
-    # Nettoyage des prix : suppression des symboles, conversion en float
-    df["prix"] = df["prix"].str.replace("€", "").str.replace(",", ".").astype(float)
+    # Nettoyage des prix : suppression des symboles et des espaces, conversion en float32
+    prix = df["prix"].astype("string").str.replace("€", "", regex=False).str.replace(",", ".", regex=False)
+    df["prix"] = pd.to_numeric(prix.str.replace(r"\s", "", regex=True), errors="coerce").astype("float32")
 
-    # Je remplace les valeurs NULL ou vides dans `rating` par "0"
-    df["rating"] = df["rating"].replace("", "0")  # Gestion des chaînes vides
-    df["rating"] = df["rating"].fillna("0")  # Gestion des valeurs NULL
+    # Rating : je ne garde que les chiffres ("1 825" -> 1825), NULL ou vide -> 0
+    rating = df["rating"].astype("string").str.replace(r"\D", "", regex=True)
+    df["rating"] = pd.to_numeric(rating, errors="coerce").fillna(0).astype("int32")
 
-    print("✅ Nettoyage terminé.")
+    if verbose:
+        print("✅ Nettoyage terminé.")
     return df
 
 
-# 📌 Sauvegarde des données nettoyées (CSV + MySQL)
-def save_cleaned_data(df, to_mysql=True):
+def peak_rss_mb():
     """
-    J'enregistre les données propres dans un fichier CSV et, si nécessaire, dans MySQL.
+    Pic de mémoire (RSS) du processus en Mo, ou None si la plateforme ne le fournit pas.
     """
-    df.to_csv("cleaned_products.csv", index=False, encoding="utf-8-sig", sep=";")
-    print("📂 Données nettoyées sauvegardées en CSV.")
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss est en octets sous macOS et en kilo-octets sous Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            memory = psutil.Process().memory_info()
+            return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+        except ImportError:
+            return None
 
-    if to_mysql:
+
+def clean_table_has_key(cursor):
+    """
+    Je vérifie que `produits_clean` existe déjà avec la colonne product_key (sinon il faut une reconstruction complète).
+    """
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'produits_clean' AND column_name = 'product_key'
+    """)
+    return cursor.fetchone()[0] > 0
+
+
+def upsert_clean_rows(cursor, df, table="produits_clean"):
+    """
+    J'insère ou je mets à jour les lignes nettoyées (clé : product_key).
+    Au-delà de bulk_load.BULK_MIN_ROWS lignes, je passe par LOAD DATA LOCAL INFILE + fusion.
+    """
+    return upsert_frame(cursor, table, df, CLEAN_COLUMNS)
+
+
+# 📌 Moteur de nettoyage par morceaux : Lecture → Nettoyage → Écriture, morceau par morceau
+def clean_in_chunks(since=None, full=True, chunksize=50_000, to_mysql=True, csv_filename="cleaned_products.csv",
+                    parquet_path=columnar.CLEAN_PATH, source=None, keep=False, watermark=None):
+    """
+    Je nettoie la table `produits` morceau par morceau : la mémoire dépend de `chunksize`, pas de
+    la taille de l'historique. Chaque morceau est écrit (upsert) puis libéré avant de lire le suivant.
+    - full=True : j'écris dans produits_clean_new, le CSV et le Parquet complets, puis j'échange atomiquement les tables.
+      Si le CSV est écrit, je le charge d'un seul coup à la fin (LOAD DATA LOCAL INFILE) au lieu d'upserter chaque morceau.
+    - full=False : j'upsert seulement le delta (lignes modifiées depuis `since`) dans produits_clean.
+    - source : autre itérable de morceaux bruts (ex. columnar.iter_run_batches) à la place de MySQL.
+    - keep=True : je garde aussi les morceaux nettoyés, concaténés dans stats["frame"].
+    - watermark : point de reprise à enregistrer si les morceaux n'ont pas de colonne updated_at.
+    Le point de reprise n'est avancé qu'à la fin, une fois tous les morceaux écrits.
+    Renvoie les statistiques du passage (lignes, durée, lignes/s, pic de mémoire).
+    """
+    start = time.perf_counter()
+    table = "produits_clean_new" if full else "produits_clean"
+    stats = {"rows": 0, "chunks": 0, "non_specifie": 0, "rating_zero": 0}
+    chunks = source if source is not None else iter_raw_chunks(since=since, chunksize=chunksize)
+    parquet_writer = columnar.CleanParquetWriter(parquet_path) if full and parquet_path else None
+    load_csv_at_end = to_mysql and full and bool(csv_filename)
+    kept = []
+    brands, product_ids = set(), set()  # Portée du regroupement des quasi-doublons en mode delta
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
         try:
-            conn = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="mamadou",
-                database="scraping_db"
-            )
-            cursor = conn.cursor()
-
-            # Pour éviter d'accumuler de la donnée en double, je recrée une table propre
-            cursor.execute("DROP TABLE IF EXISTS produits_clean;")
-            cursor.execute("""
-                CREATE TABLE produits_clean (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    marque VARCHAR(255),
-                    nom_produit VARCHAR(255),
-                    lien TEXT,
-                    prix FLOAT,
-                    rating VARCHAR(50) DEFAULT '0',
-                    infos_livraison VARCHAR(255) DEFAULT 'non spécifié'
-                )
-            """)
-
-            # Vérification : s'assurer que toutes les colonnes sont bien présentes
-            cleaned_data = df[["marque", "nom_produit", "lien", "prix", "rating", "infos_livraison"]].values.tolist()
-
-            # Insertion des données dans MySQL
-            sql = """
-            INSERT INTO produits_clean (marque, nom_produit, lien, prix, rating, infos_livraison)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            cursor.executemany(sql, cleaned_data)
-            conn.commit()
-
-            print("✅ Données nettoyées insérées dans MySQL (table `produits_clean`).")
-
-        except mysql.connector.Error as e:
-            print(f"❌ Erreur MySQL : {e}")
+            if to_mysql:
+                if full:
+                    cursor.execute("DROP TABLE IF EXISTS produits_clean_new, produits_clean_old")
+                cursor.execute(CLEAN_TABLE_DDL.format(table=table))
+                conn.commit()
+
+            for chunk in chunks:
+                if "updated_at" in chunk.columns:
+                    chunk_max = chunk["updated_at"].max()
+                    watermark = chunk_max if watermark is None else max(watermark, chunk_max)
+
+                chunk = clean_data(chunk, verbose=False)
 
+                if full and csv_filename:
+                    chunk.to_csv(csv_filename, index=False, encoding="utf-8-sig", sep=";",
+                                 mode="w" if stats["chunks"] == 0 else "a", header=stats["chunks"] == 0)
+                if parquet_writer is not None:
+                    parquet_writer.write(chunk)
+                if to_mysql and not load_csv_at_end:
+                    upsert_clean_rows(cursor, chunk, table=table)
+                    conn.commit()
+                if keep:
+                    kept.append(chunk)
+                if not full:
+                    brands.update(None if pd.isna(brand) else brand for brand in chunk["marque"].unique())
+                    product_ids.update(pid for pid in map(product_id, chunk["lien"]) if pid is not None)
+
+                stats["rows"] += len(chunk)
+                stats["chunks"] += 1
+                stats["non_specifie"] += int((chunk["infos_livraison"] == "non spécifié").sum())
+                stats["rating_zero"] += int((chunk["rating"] == 0).sum())
+                print(f"🔄 Morceau {stats['chunks']} nettoyé ({stats['rows']} lignes au total).")
+
+            if parquet_writer is not None:
+                parquet_writer.close()
+
+            if load_csv_at_end and stats["rows"]:
+                load_csv_or_upsert(cursor, csv_filename, table, CLEAN_COLUMNS, stats["rows"], chunksize=chunksize)
+                conn.commit()
+
+            if to_mysql and stats["rows"]:
+                # Quasi-doublons : je recalcule les groupes sur toute la table (avant l'échange en mode complet),
+                # ou seulement sur les marques touchées par le delta
+                if full:
+                    assign_canonical_ids(conn, table)
+                else:
+                    assign_canonical_ids(conn, table, brands=brands, product_ids=product_ids)
+
+            if to_mysql:
+                if full:
+                    conn.commit()
+                    cursor.execute("SHOW TABLES LIKE 'produits_clean'")
+                    if cursor.fetchone():
+                        cursor.execute("RENAME TABLE produits_clean TO produits_clean_old, produits_clean_new TO produits_clean")
+                        cursor.execute("DROP TABLE produits_clean_old")
+                    else:
+                        cursor.execute("RENAME TABLE produits_clean_new TO produits_clean")
+                # Le point de reprise n'avance qu'une fois les lignes en place (après l'échange en mode complet)
+                if watermark is not None:
+                    set_watermark(cursor, pd.Timestamp(watermark).to_pydatetime())
+                    conn.commit()
+        except Exception:
+            if parquet_writer is not None:
+                parquet_writer.abort()  # Je garde l'ancien fichier Parquet intact
+            raise
         finally:
-            if 'cursor' in locals() and cursor:
-                cursor.close()
-            if 'conn' in locals() and conn:
-                conn.close()
+            cursor.close()
+
+    stats["duration"] = time.perf_counter() - start
+    stats["rows_per_s"] = stats["rows"] / stats["duration"] if stats["duration"] else 0.0
+    stats["peak_rss_mb"] = peak_rss_mb()
+    if keep:
+        stats["frame"] = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=CLEAN_COLUMNS)
+    mode = "full" if full else "delta"
+    metrics.observe("clean_duration_seconds", stats["duration"], mode=mode)
+    metrics.observe("clean_rows_per_second", stats["rows_per_s"], mode=mode)
+    if stats["peak_rss_mb"] is not None:
+        metrics.set_gauge("clean_peak_rss_mb", stats["peak_rss_mb"])
+    return stats
+
+
+def print_clean_stats(stats):
+    peak = f"{stats['peak_rss_mb']:.0f} Mo" if stats["peak_rss_mb"] is not None else "inconnu"
+    print(f"✅ Nettoyage terminé : {stats['rows']} lignes en {stats['chunks']} morceaux, "
+          f"{stats['duration']:.2f}s ({stats['rows_per_s']:.0f} lignes/s), pic mémoire {peak}.")
+    print(f"   {stats['non_specifie']} lignes sans infos de livraison, {stats['rating_zero']} lignes sans avis.")
 
 
 # 📌 Exécution complète : Chargement → Nettoyage → Sauvegarde
-def main():
-    # Je récupère les données brutes depuis MySQL
-    df = load_data_from_mysql()
-    
-    if df is not None:
-        # Nettoyage en profondeur des données
-        df_cleaned = clean_data(df)
+def main(full=False, chunksize=50_000, from_parquet=False, raw=None, raw_since=None, keep=False):
+    """
+    Par défaut, je ne nettoie que les lignes nouvelles ou modifiées depuis le dernier passage.
+    Avec full=True (ou si `produits_clean` n'a pas encore la clé produit), je reconstruis tout.
+    Avec from_parquet=True, je relis le dernier passage de scraping depuis le stockage Parquet au lieu
+    de MySQL (reconstruction complète).
+    Avec `raw` (DataFrame du passage de scraping commencé à `raw_since`, heure du serveur MySQL, voir
+    projet.main), je le nettoie directement comme un delta, sans relire MySQL : seulement en mode
+    incrémental, et si aucune ligne modifiée avant ce passage n'attend encore d'être nettoyée
+    (sinon je relis le delta depuis MySQL).
+    Avec keep=True, je renvoie le DataFrame nettoyé (None en cas d'erreur MySQL).
+    """
+    since, source, cleaned, watermark = None, None, None, None
+    try:
+        if from_parquet:
+            # Dernier passage de scraping seulement (les passages précédents contiennent les mêmes produits)
+            run_id = columnar.latest_run_id()
+            if run_id is None:
+                # Sans passage, la lecture prendrait toutes les partitions (ou échouerait sans dossier)
+                print(f"❌ Aucun passage de scraping dans {columnar.RAW_DIR} : nettoyage depuis le Parquet impossible.")
+                return None
+            full = True
+            source = columnar.iter_run_batches(run_id=run_id, batch_size=chunksize)
+        elif not full:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    full = not clean_table_has_key(cursor)
+                finally:
+                    cursor.close()
+            if full:
+                print("ℹ Table produits_clean absente ou sans clé produit : reconstruction complète.")
+            else:
+                since = get_watermark()
+                if raw is not None and raw_since is not None:
+                    pending, watermark = pending_changes(since, raw_since)
+                    if pending:
+                        watermark = None
+                        print(f"ℹ {pending} lignes modifiées avant ce passage ne sont pas encore nettoyées : "
+                              "je relis le delta depuis MySQL.")
+                    else:
+                        # Le delta est exactement ce passage : données déjà en mémoire, découpées en morceaux
+                        source = (raw.iloc[i:i + chunksize].copy() for i in range(0, len(raw), chunksize))
 
-        # Vérification rapide après nettoyage
-        print(df_cleaned[df_cleaned["infos_livraison"] == "non spécifié"])  # Vérifier que les valeurs NULL sont bien remplacées
-        print(df_cleaned[df_cleaned["rating"] == "0"])  # Vérifier que le rating est bien remplacé
+        # Lecture, nettoyage et écriture morceau par morceau (tout, ou seulement le delta)
+        stats = clean_in_chunks(since=since, full=full, chunksize=chunksize, source=source, keep=keep,
+                                watermark=watermark)
+        print_clean_stats(stats)
+        cleaned = stats.get("frame")
+        if keep and raw is not None and source is None and not full:
+            # Delta relu depuis MySQL : je renvoie tout de même les produits de ce passage
+            cleaned = clean_data(raw.copy(), verbose=False)
+    except mysql.connector.Error as e:
+        print(f"❌ Erreur MySQL : {e}")
 
-        # Sauvegarde des données nettoyées
-        save_cleaned_data(df_cleaned)
+    print_pool_stats()
+    return cleaned
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Nettoyage des produits scrappés")
+    parser.add_argument("--full", action="store_true", help="reconstruire entièrement produits_clean")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="nombre de lignes par morceau")
+    parser.add_argument("--from-parquet", action="store_true", help="lire les données brutes depuis le stockage Parquet")
+    args = parser.parse_args()
+    try:
+        main(full=args.full, chunksize=args.chunksize, from_parquet=args.from_parquet)
+    finally:
+        metrics.export("clean")
@@ -2,19 +2,23 @@ import mysql.connector
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-
-# 📌 Connexion à MySQL pour récupérer les données nettoyées
-def load_data():
+from db_pool import get_connection
+from aggregations import load_report_data, report_data_from_frame
+import columnar
+
+# 📌 Connexion à MySQL pour récupérer les données nettoyées (table complète, pour une analyse ad hoc)
+# Les graphiques n'en ont pas besoin : ils utilisent les agrégations calculées dans MySQL (aggregations.py)
+def load_data(source="mysql", columns=None):
+    if source == "parquet":
+        # Lecture du fichier Parquet (projection de colonnes + memory-mapping), sans passer par MySQL
+        df = columnar.read_clean(columns=columns)
+        print("✅ Données chargées depuis le stockage Parquet.")
+        return df
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="mamadou",
-            database="scraping_db"
-        )
-        query = "SELECT * FROM produits_clean"  # Je récupère uniquement les données nettoyées
-        df = pd.read_sql(query, conn)
-        conn.close()
+        with get_connection() as conn:
+            query = "SELECT * FROM produits_clean"  # Je récupère uniquement les données nettoyées
+            df = pd.read_sql(query, conn)
+        df["prix"] = df["prix"].astype(float)  # DECIMAL -> float pour les graphiques
         print("✅ Données chargées depuis MySQL.")
         return df
     except mysql.connector.Error as e:
@@ -23,30 +27,27 @@ def load_data():
 
 
 # 📌 1️⃣ Je fais une analyse rapide des données pour voir si tout est en ordre
-def analyze_data(df):
-    print("🔎 Aperçu des données :")
-    print(df.head())  # Quelques lignes pour vérifier
-    print("\n📌 Infos générales :")
-    print(df.info())  # Vérifier les types de données
-    print("\n🔢 Statistiques descriptives :")
-    print(df.describe())  # Avoir des stats globales
-
-    print("\n❗️ Valeurs manquantes :")
-    print(df.isnull().sum())  # Je veux voir s’il y a des données vides
-
-    print("\n🔄 Nombre de doublons :", df.duplicated().sum())  # Vérifier les doublons
+def analyze_data(data):
+    print("🔎 Statistiques globales :")
+    print(data["summary"].T)  # Une seule ligne calculée par MySQL, affichée en colonne
+    print("\n🏷 Marques les plus représentées :")
+    print(data["brand_counts"])
+    print("\n🚚 Modes de livraison :")
+    print(data["shipping_shares"])
 
 
 # 📌 2️⃣ Distribution des prix des produits avec annotations pour les produits les plus chers
-def plot_price_distribution(df):
-    plt.figure(figsize=(10, 6))
-    sns.histplot(df["prix"], bins=20, kde=True, color="blue")
+def plot_price_distribution(data):
+    fig = plt.figure(figsize=(10, 6))
+    hist = data["price_histogram"]
+    plt.bar(hist["borne_basse"], hist["nb_produits"], width=hist["borne_haute"] - hist["borne_basse"],
+            align="edge", color="blue", alpha=0.6, edgecolor="black")
     plt.title("📈 Distribution des prix des produits (Marques incluses)")
     plt.xlabel("Prix (€)")
     plt.ylabel("Nombre de produits")
 
     # J'affiche les 5 produits les plus chers pour voir les extrêmes
-    top_expensive = df.nlargest(5, "prix")[["marque", "nom_produit", "prix"]]
+    top_expensive = data["top_expensive"]
     for i, row in enumerate(top_expensive.iterrows()):
         index, row = row
         plt.annotate(f"{row['marque']} ({row['prix']}€)", 
@@ -55,54 +56,63 @@ def plot_price_distribution(df):
                      arrowprops=dict(arrowstyle="->", color="black"), fontsize=10, color="black")
 
     plt.grid(True)
-    plt.show()
+    return fig
 
 
 # 📌 3️⃣ Voir quelles marques proposent le plus de produits (Top 10)
-def plot_products_per_brand(df):
-    plt.figure(figsize=(10, 6))
-    brand_counts = df["marque"].value_counts().head(10)
-    sns.barplot(x=brand_counts.index, y=brand_counts.values, palette="viridis")
+def plot_products_per_brand(data):
+    fig = plt.figure(figsize=(10, 6))
+    brand_counts = data["brand_counts"]
+    sns.barplot(x=brand_counts["marque"], y=brand_counts["nb_produits"], palette="viridis")
     plt.xticks(rotation=45)
     plt.title("Nombre de produits par marque (Top 10)")
     plt.xlabel("Marque")
     plt.ylabel("Nombre de produits")
-    plt.show()
+    return fig
 
 
 # 📌 4️⃣ Voir comment les prix varient en fonction des marques (boxplot)
-def plot_price_boxplot(df):
-    plt.figure(figsize=(12, 6))
-    top_brands = df["marque"].value_counts().index[:10]  
-    df_top_brands = df[df["marque"].isin(top_brands)]
-    sns.boxplot(x="marque", y="prix", data=df_top_brands, palette="coolwarm")
+def plot_price_boxplot(data):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    # Les quartiles viennent de MySQL : je dessine les boîtes directement (moustaches = min / max)
+    quantiles = data["brand_price_quantiles"]
+    stats = [
+        {"label": row["marque"], "whislo": row["prix_min"], "q1": row["q1"], "med": row["mediane"],
+         "q3": row["q3"], "whishi": row["prix_max"], "fliers": []}
+        for _, row in quantiles.iterrows()
+    ]
+    boxes = ax.bxp(stats, patch_artist=True)
+    for patch, color in zip(boxes["boxes"], sns.color_palette("coolwarm", len(stats))):
+        patch.set_facecolor(color)
     plt.xticks(rotation=45)
     plt.title("Répartition des prix par marque (Top 10)")
     plt.xlabel("Marque")
     plt.ylabel("Prix (€)")
-    plt.show()
+    return fig
 
 
 # 📌 5️⃣ Voir la répartition du nombre d’avis sur les produits
-def plot_rating_distribution(df):
-    plt.figure(figsize=(8, 5))
-    sns.histplot(df["rating"].astype(float), bins=15, kde=True, color="green")
+def plot_rating_distribution(data):
+    fig = plt.figure(figsize=(8, 5))
+    hist = data["rating_histogram"]
+    plt.bar(hist["borne_basse"], hist["nb_produits"], width=hist["borne_haute"] - hist["borne_basse"],
+            align="edge", color="green", alpha=0.6, edgecolor="black")
     plt.title("📊 Distribution des avis (nombre d'évaluations)")
     plt.xlabel("Nombre d'avis")
     plt.ylabel("Nombre de produits")
     plt.grid(True)
-    plt.show()
+    return fig
 
 
 # 📌 6️⃣ Voir si le prix a un impact sur le nombre d’avis
-def plot_price_vs_rating(df):
-    plt.figure(figsize=(10, 6))
-    df["rating"] = df["rating"].astype(float)
-    
-    sns.scatterplot(x=df["prix"], y=df["rating"], alpha=0.5, color="red")
+def plot_price_vs_rating(data):
+    fig = plt.figure(figsize=(10, 6))
+    # Nuage agrégé par cases : la taille du point dépend du nombre de produits dans la case
+    grid = data["price_rating_grid"]
+    sns.scatterplot(x=grid["prix"], y=grid["rating"], size=grid["nb_produits"], alpha=0.5, color="red", legend=False)
     
     # J'affiche les 3 produits les plus évalués pour voir les tendances
-    top_rated = df.nlargest(3, "rating")[["marque", "nom_produit", "prix", "rating"]]
+    top_rated = data["top_rated"]
     for i, row in top_rated.iterrows():
         plt.annotate(f"{row['marque']} ({int(row['rating'])} avis)", 
                      xy=(row["prix"], row["rating"]), 
@@ -113,38 +123,55 @@ def plot_price_vs_rating(df):
     plt.xlabel("Prix (€)")
     plt.ylabel("Nombre d'avis")
     plt.grid(True)
-    plt.show()
+    return fig
 
 
 # 📌 7️⃣ Voir comment se répartissent les méthodes de livraison
-def plot_shipping_distribution(df):
-    plt.figure(figsize=(8, 8))
-    shipping_counts = df["infos_livraison"].value_counts()
+def plot_shipping_distribution(data):
+    fig = plt.figure(figsize=(8, 8))
+    shipping_counts = data["shipping_shares"]
     colors = sns.color_palette("pastel")
 
-    plt.pie(shipping_counts, labels=shipping_counts.index, autopct="%1.1f%%", 
+    plt.pie(shipping_counts["nb_produits"], labels=shipping_counts["infos_livraison"], autopct="%1.1f%%", 
             colors=colors, wedgeprops={"edgecolor": "black"})
 
     plt.title("🚚 Répartition des types de livraison (en %)")
     plt.legend(title="Méthode de livraison", loc="best", bbox_to_anchor=(1, 1))
-    plt.show()
+    return fig
 
 
-# ✅ Exécuter toutes les analyses et visualisations
-def main():
-    df = load_data()
-    
-    if df is not None:
-        analyze_data(df)  
+PLOTS = [
+    plot_price_distribution,
+    plot_products_per_brand,
+    plot_price_boxplot,
+    plot_rating_distribution,
+    plot_price_vs_rating,
+    plot_shipping_distribution,
+]
 
-        # 📊 Générer les graphiques améliorés
-        plot_price_distribution(df)  
-        plot_products_per_brand(df)
-        plot_price_boxplot(df)
-        plot_rating_distribution(df)
-        plot_price_vs_rating(df)  
-        plot_shipping_distribution(df) 
+
+# ✅ Exécuter toutes les analyses et visualisations
+def main(source="mysql"):
+    if source == "parquet":
+        # Seules les colonnes utiles aux graphiques sont lues depuis le Parquet
+        df = load_data("parquet", columns=["marque", "nom_produit", "prix", "rating", "infos_livraison"])
+        data = report_data_from_frame(df)
+    else:
+        try:
+            # Seules les agrégations (quelques dizaines de lignes) sont rapatriées depuis MySQL
+            data = load_report_data()
+        except mysql.connector.Error as e:
+            print(f"❌ Erreur MySQL : {e}")
+            return
+
+    analyze_data(data)
+
+    # 📊 Générer les graphiques améliorés
+    for plot in PLOTS:
+        plot(data)
+        plt.show()
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+    main(source="parquet" if "--parquet" in sys.argv else "mysql")
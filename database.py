@@ -1,35 +1,95 @@
+import hashlib
+import re
+import time
+from decimal import Decimal, InvalidOperation
 import mysql.connector
+from db_pool import get_connection
+from bulk_load import upsert_rows
+import metrics
 
-def insert_into_mysql(data):
+PRODUITS_COLUMNS = ["product_key", "marque", "nom_produit", "lien", "prix", "rating", "infos_livraison"]
+
+# Identifiant Decathlon dans l'URL produit (…/_/R-p-358423?mc=8960759&c=…)
+PRODUCT_ID_RE = re.compile(r"R-p-([0-9A-Za-z]+)")
+MODEL_CODE_RE = re.compile(r"[?&]mc=([^&#]+)")
+
+
+def product_key(lien, marque=None, nom_produit=None):
+    """
+    Clé stable d'un produit à partir de son lien : identifiant `R-p-XXXXXX` + code modèle `mc=`.
+    Exemple : "R-p-358423:8960759".
+    Sans identifiant, clé de repli `h-` + empreinte SHA-1 du lien, ou à défaut de la marque et du nom
+    (même règle que migrations.PRODUCT_KEY_SQL) : une clé NULL passerait l'index unique à chaque
+    passage. Renvoie None seulement si le lien, la marque et le nom sont tous vides.
+    """
+    match = PRODUCT_ID_RE.search(lien or "")
+    if match:
+        model = MODEL_CODE_RE.search(lien)
+        return f"R-p-{match.group(1)}:{model.group(1)}" if model else f"R-p-{match.group(1)}"
+    if lien:
+        source = lien
+    elif marque or nom_produit:
+        source = "|".join(str(value) for value in (marque, nom_produit) if value is not None)
+    else:
+        return None
+    return "h-" + hashlib.sha1(source.encode("utf-8")).hexdigest()[:20]
+
+
+def parse_price(prix):
+    """
+    "129,99€" -> Decimal("129.99") pour la colonne DECIMAL ; None si le prix est vide ou illisible.
+    """
+    cleaned = re.sub(r"[^0-9,.]", "", str(prix or "")).replace(",", ".")
+    try:
+        return Decimal(cleaned) if cleaned else None
+    except InvalidOperation:
+        return None
+
+
+def parse_rating(rating):
     """
-    Insère les données scrappées dans la base de données MySQL.
+    Nombre d'avis en entier ("1 825" -> 1825) ; 0 si absent.
+    """
+    digits = re.sub(r"[^0-9]", "", str(rating or ""))
+    return int(digits) if digits else 0
+
+
+def product_rows(data):
+    """
+    Lignes (tuples dans l'ordre de PRODUITS_COLUMNS) de la table `produits` pour les produits scrappés.
+    """
+    return [(product_key(p["Lien"], p["Marque"], p["Nom du produit"]), p["Marque"], p["Nom du produit"], p["Lien"], parse_price(p["Prix"]), parse_rating(p["Rating (nombre d'avis)"]), p["Infos de livraison"]) for p in data]
+
+
+def insert_into_mysql(data, batch_size=500):
+    """
+    Insère (ou met à jour) les données scrappées dans la base de données MySQL.
+    Les produits sont identifiés par leur clé produit : relancer le scraping met à jour les lignes
+    existantes au lieu de les dupliquer.
+    Les gros volumes passent par LOAD DATA LOCAL INFILE + fusion (bulk_load), les petits lots par executemany.
+    Une erreur MySQL est affichée puis relancée : l'appelant compte le lot comme non écrit.
     """
     try:
-        # Connexion à la base de données
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",  
-            password="mamadou", 
-            database="scraping_db"
-        )
-        cursor = conn.cursor()
-
-        # Requête SQL d'insertion
-        sql = """
-        INSERT INTO produits (marque, nom_produit, lien, prix, rating, infos_livraison) 
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-
-        # Insérer les données
-        cursor.executemany(sql, [(p["Marque"], p["Nom du produit"], p["Lien"], p["Prix"], p["Rating (nombre d'avis)"], p["Infos de livraison"]) for p in data])
-
-        # Commit et fermeture
-        conn.commit()
+        # Connexion empruntée au pool partagé
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            rows = product_rows(data)
+
+            # Insérer les données par lots
+            start = time.perf_counter()
+            try:
+                method = upsert_rows(cursor, "produits", PRODUITS_COLUMNS, rows, batch_size)
+
+                # Commit
+                conn.commit()
+            finally:
+                cursor.close()
+            duration = time.perf_counter() - start
+            metrics.inc("insert_rows_total", len(rows), method=method)
+            metrics.observe("insert_rows_per_second", len(rows) / (duration or 1e-9), method=method)
         print("✅ Données insérées avec succès dans MySQL.")
 
     except mysql.connector.Error as e:
         print(f"❌ Erreur MySQL : {e}")
-
-    finally:
-        cursor.close()
-        conn.close()
+        raise
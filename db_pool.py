@@ -0,0 +1,179 @@
+"""
+Pool de connexions MySQL partagé par toutes les étapes (scraping, nettoyage, visualisation).
+
+La configuration vient des variables d'environnement (MYSQL_HOST, MYSQL_PORT, MYSQL_USER,
+MYSQL_PASSWORD, MYSQL_DATABASE, MYSQL_POOL_SIZE, MYSQL_AUTO_MIGRATE, MYSQL_LOCAL_INFILE), avec les valeurs historiques du projet par
+défaut. Les connexions sont créées à la demande puis réutilisées d'un appel à l'autre.
+"""
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+import mysql.connector
+
+
+def load_config():
+    """
+    Je lis la configuration MySQL depuis l'environnement.
+    """
+    return {
+        "host": os.environ.get("MYSQL_HOST", "localhost"),
+        "port": int(os.environ.get("MYSQL_PORT", "3306")),
+        "user": os.environ.get("MYSQL_USER", "root"),
+        "password": os.environ.get("MYSQL_PASSWORD", "mamadou"),
+        "database": os.environ.get("MYSQL_DATABASE", "scraping_db"),
+        # Nécessaire au chargement en masse (bulk_load.py, LOAD DATA LOCAL INFILE)
+        "allow_local_infile": os.environ.get("MYSQL_LOCAL_INFILE", "1") != "0",
+    }
+
+
+class ConnectionPool:
+    """
+    Pool de connexions : au plus `size` connexions ouvertes, réutilisées (LIFO) entre les appels.
+    Les statistiques (emprunts, temps d'attente, connexions créées) sont disponibles via stats().
+    """
+
+    def __init__(self, config, size=5):
+        self.config = config
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "wait_time": 0.0,
+            "max_wait_time": 0.0,
+            "connections_created": 0,
+            "reconnects": 0,
+        }
+
+    def _create(self):
+        conn = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _checkout(self):
+        start = time.perf_counter()
+        self._slots.acquire()
+        wait = time.perf_counter() - start
+        try:
+            try:
+                conn = self._idle.get_nowait()
+                if not conn.is_connected():
+                    conn.reconnect(attempts=2, delay=1)
+                    with self._lock:
+                        self._stats["reconnects"] += 1
+            except queue.Empty:
+                conn = self._create()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_time"] += wait
+            self._stats["max_wait_time"] = max(self._stats["max_wait_time"], wait)
+        return conn
+
+    def _release(self, conn):
+        """
+        Rend la connexion au pool après avoir annulé toute transaction laissée ouverte : l'emprunteur
+        suivant ne doit hériter ni de ses écritures ni de son instantané REPEATABLE READ.
+        Une connexion qui ne peut pas être remise à zéro est fermée au lieu d'être réutilisée.
+        """
+        try:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                try:
+                    conn.close()
+                except mysql.connector.Error:
+                    pass
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Emprunte une connexion pour la durée du bloc `with`, puis la rend au pool.
+        Ce qui n'a pas été validé (commit) dans le bloc est annulé, exception ou non.
+        """
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["idle"] = self._idle.qsize()
+        stats["size"] = self.size
+        return stats
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Renvoie le pool partagé du processus (créé au premier appel).
+    À la création, les migrations de schéma en attente sont appliquées (sauf si MYSQL_AUTO_MIGRATE=0).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(load_config(), size=int(os.environ.get("MYSQL_POOL_SIZE", "5")))
+            if os.environ.get("MYSQL_AUTO_MIGRATE", "1") != "0":
+                from migrations import apply_migrations
+                with pool.connection() as conn:
+                    apply_migrations(conn)
+            _pool = pool
+        return _pool
+
+
+def get_connection():
+    """
+    Raccourci : `with get_connection() as conn:` emprunte une connexion au pool partagé.
+    """
+    return get_pool().connection()
+
+
+def pool_stats():
+    """
+    Compteurs du pool, ou None si aucun pool n'a été créé (aucune connexion n'est ouverte pour les lire).
+    """
+    pool = _pool
+    return pool.stats() if pool is not None else None
+
+
+def print_pool_stats():
+    stats = pool_stats()
+    if stats is None:
+        return
+    print(f"🔌 Pool MySQL : {stats['checkouts']} emprunts, {stats['connections_created']} connexions créées, "
+          f"{stats['reconnects']} reconnexions, attente totale {stats['wait_time']:.3f}s "
+          f"(max {stats['max_wait_time']:.3f}s)")
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
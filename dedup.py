@@ -0,0 +1,311 @@
+"""
+Détection des quasi-doublons (même produit sous un nom un peu différent, variantes de couleur...).
+
+Deux produits sont regroupés s'ils ont le même identifiant Decathlon (`R-p-XXXXXX` dans le lien,
+quel que soit le code modèle `mc=`), ou s'ils sont de la même marque, avec les mêmes numéros de
+modèle (mh500, 900...) et des noms très proches. La proximité des noms ne réunit jamais deux
+identifiants Decathlon différents (« run 500 confort » et « run 500 dry » sont deux produits) :
+elle rattache seulement les produits sans identifiant.
+Pour éviter la comparaison de toutes les paires (O(n²)), les noms normalisés sont découpés en
+n-grammes de caractères, résumés par une signature MinHash, puis indexés par LSH (bandes de la
+signature) : seuls les produits qui partagent un compartiment sont comparés. Le temps est
+quasi linéaire en nombre de produits.
+
+Chaque groupe reçoit un identifiant canonique (la plus petite clé produit du groupe, ou `id-<id>`
+pour un groupe sans clé), écrit dans la colonne `canonical_id` de `produits_clean`. Après un
+nettoyage incrémental, seules les marques touchées par le delta sont regroupées à nouveau : un
+groupe ne dépasse jamais une marque, sauf par un identifiant Decathlon commun, et ces marques-là
+sont ajoutées aussi.
+"""
+import re
+import unicodedata
+import zlib
+import numpy as np
+import pandas as pd
+from database import PRODUCT_ID_RE
+
+# Mots retirés des noms avant comparaison : les variantes de couleur restent le même produit
+COLOR_WORDS = {
+    "noir", "noire", "noires", "noirs", "blanc", "blanche", "blanches", "blancs", "bleu", "bleue", "bleues",
+    "bleus", "rouge", "rouges", "vert", "verte", "vertes", "verts", "gris", "grise", "grises", "jaune",
+    "jaunes", "rose", "roses", "orange", "oranges", "violet", "violette", "violets", "marron", "beige",
+    "kaki", "turquoise", "bordeaux", "translucide", "fonce", "clair", "multicolore",
+}
+
+# Paires d'identifiants relevées à la main dans cleaned_products.csv : noms proches, produits distincts
+KNOWN_DISTINCT = [
+    ("R-p-325737", "R-p-333374"),  # short kiprun run 500 confort / run 500 dry
+    ("R-p-333640", "R-p-333614"),  # veste de pêche fj 500 wpf / fj 500 th
+    ("R-p-356263", "R-p-350750"),  # lunettes roadr 900 perf light / perf
+]
+
+
+def normalize_name(name):
+    """
+    Minuscules, accents et ponctuation retirés, mots de couleur supprimés.
+    """
+    name = unicodedata.normalize("NFKD", str(name or "").lower())
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    words = re.sub(r"[^a-z0-9]+", " ", name).split()
+    return " ".join(w for w in words if w not in COLOR_WORDS)
+
+
+def shingles(name, n=3):
+    """
+    Hashes (32 bits) des n-grammes de caractères du nom normalisé.
+    """
+    padded = f" {name} "
+    grams = {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+    return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHashLSH:
+    """
+    Signatures MinHash (`num_perm` permutations) et index LSH en `bands` bandes.
+    Avec 128 permutations en 32 bandes de 4, deux noms de similarité de Jaccard 0,75 partagent
+    un compartiment avec une probabilité > 99,9 %, contre ~25 % pour une similarité de 0,3
+    (ces derniers candidats sont ensuite écartés par la comparaison des signatures).
+    """
+
+    def __init__(self, num_perm=128, bands=32, seed=0):
+        if num_perm % bands:
+            raise ValueError("num_perm doit être un multiple de bands")
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Hachage « multiply-shift » : h(x) = (a*x + b) mod 2^64 >> 32, avec a impair (pas de modulo coûteux)
+        self.a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+
+    def signatures(self, shingle_sets, batch_size=2000):
+        """
+        Matrice (nombre de noms × num_perm) des signatures, calculée par lots vectorisés.
+        """
+        result = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint64)
+        for start in range(0, len(shingle_sets), batch_size):
+            batch = shingle_sets[start:start + batch_size]
+            lengths = np.array([len(s) for s in batch])
+            values = np.concatenate(batch)
+            hashed = (self.a[:, None] * values + self.b[:, None]) >> np.uint64(32)  # (num_perm, n-grammes)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            result[start:start + len(batch)] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        return result
+
+    def candidate_pairs(self, signatures, block_keys):
+        """
+        Paires candidates (tableaux i, j) : pour chaque bande, chaque produit est associé au premier
+        produit de son compartiment. `block_keys` fait partie de la clé des compartiments : deux
+        blocs différents (marque, numéros de modèle) ne sont jamais comparés.
+        """
+        block_codes = pd.factorize(pd.Series(block_keys))[0].astype(np.uint64)
+        first, second = [], []
+        for band in range(self.bands):
+            # Clé du compartiment : bloc + valeurs de la bande, combinés en un seul entier 64 bits
+            key = block_codes.copy()
+            for column in signatures[:, band * self.rows:(band + 1) * self.rows].T:
+                key = key * np.uint64(1_000_003) ^ column
+            _, bucket_ids, counts = np.unique(key, return_inverse=True, return_counts=True)
+            order = np.argsort(bucket_ids, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            leaders = order[starts][bucket_ids]  # premier produit du compartiment de chaque ligne
+            shared = (counts[bucket_ids] > 1) & (leaders != np.arange(len(key)))
+            first.append(leaders[shared])
+            second.append(np.flatnonzero(shared))
+        return np.concatenate(first), np.concatenate(second)
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = np.arange(size)
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def product_id(lien):
+    match = PRODUCT_ID_RE.search(str(lien or ""))
+    return f"R-p-{match.group(1)}" if match else None
+
+
+def canonical_ids(df, threshold=0.75, num_perm=128, bands=32):
+    """
+    Identifiant canonique de chaque ligne de `df` (colonnes product_key, marque, nom_produit, lien).
+    Les candidats LSH ne sont regroupés que si leur similarité estimée (part des valeurs MinHash
+    égales) atteint `threshold`. Renvoie une Series alignée sur l'index de `df`.
+    """
+    n = len(df)
+    if n == 0:
+        return pd.Series([], index=df.index, dtype="object")
+    keys = df["product_key"].astype("string").fillna("").to_numpy()
+    groups = UnionFind(n)
+
+    # 1) Même identifiant produit dans le lien (variantes de couleur / code modèle)
+    pids = [product_id(lien) for lien in df["lien"]]  # pas de Series.map : None deviendrait NaN
+    first_by_id = {}
+    for i, pid in enumerate(pids):
+        if pid is not None:
+            groups.union(first_by_id.setdefault(pid, i), i)
+    group_pid = {groups.find(i): pid for i, pid in enumerate(pids) if pid is not None}
+
+    # 2) Noms proches via MinHash + LSH, comparés seulement à marque et numéros de modèle identiques
+    names = df["nom_produit"].map(normalize_name)
+    lsh = MinHashLSH(num_perm, bands)
+    name_codes, unique_names = pd.factorize(names)  # une signature par nom distinct
+    signatures = lsh.signatures([shingles(name) for name in unique_names])[name_codes]
+    model_numbers = names.map(lambda name: " ".join(sorted(w for w in set(name.split()) if any(c.isdigit() for c in w))))
+    blocks = df["marque"].astype("string").fillna("").to_numpy() + "|" + model_numbers.to_numpy()
+    first, second = lsh.candidate_pairs(signatures, blocks)
+    # Similarité estimée = part des valeurs MinHash égales ; chaque paire n'est comparée qu'une fois
+    pairs = np.unique(np.column_stack([first, second]), axis=0) if len(first) else np.empty((0, 2), dtype=int)
+    similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+    for i, j in pairs[similarity >= threshold]:
+        root_i, root_j = groups.find(i), groups.find(j)
+        pid_i, pid_j = group_pid.get(root_i), group_pid.get(root_j)
+        if pid_i is not None and pid_j is not None and pid_i != pid_j:
+            continue  # Deux identifiants Decathlon différents : produits distincts malgré des noms proches
+        groups.union(root_i, root_j)
+        if pid_i or pid_j:
+            group_pid[groups.find(root_i)] = pid_i or pid_j
+
+    # Identifiant canonique : la plus petite clé produit du groupe
+    roots = np.array([groups.find(i) for i in range(n)])
+    canonical = pd.Series(keys, dtype="string").replace("", pd.NA).groupby(roots).transform("min")
+    canonical.index = df.index
+    return canonical.astype(object).where(canonical.notna(), None)
+
+
+def check_known_pairs(df, canonical, distinct=KNOWN_DISTINCT):
+    """
+    Paires de `distinct` (identifiants R-p-) regroupées à tort par `canonical`, et identifiants
+    dont les lignes (variantes de couleur) sont réparties dans plusieurs groupes.
+    """
+    pids = pd.Series([product_id(lien) for lien in df["lien"]], index=df.index)
+    groups_by_pid = canonical.groupby(pids).agg(lambda values: set(values.dropna()))
+    merged = [(a, b) for a, b in distinct
+              if a in groups_by_pid and b in groups_by_pid and groups_by_pid[a] & groups_by_pid[b]]
+    split = [pid for pid, values in groups_by_pid.items() if len(values) > 1]
+    return merged, split
+
+
+ROW_COLUMNS = ["id", "product_key", "marque", "nom_produit", "lien"]
+
+
+def _batches(values, size=1000):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _brand_condition(brands):
+    """
+    Condition SQL (et paramètres) sur la colonne marque ; None désigne les lignes sans marque.
+    """
+    named = [brand for brand in brands if brand is not None]
+    conditions = [f"marque IN ({', '.join(['%s'] * len(named))})"] if named else []
+    if len(named) < len(brands):
+        conditions.append("marque IS NULL")
+    return " OR ".join(conditions), named
+
+
+def touched_rows(cursor, table, brands, product_ids):
+    """
+    Lignes à regrouper après un delta : toutes celles des marques `brands`, plus celles des marques
+    qui partagent un identifiant Decathlon avec elles (jusqu'à ce qu'aucune marque ne s'ajoute).
+    """
+    brands, product_ids = set(brands), set(product_ids)
+    loaded, searched, frames = set(), set(), []
+    while True:
+        for batch in _batches(sorted(product_ids - searched)):
+            # La clé produit commence par l'identifiant : recherche par l'index unique
+            condition = " OR ".join(["product_key = %s OR product_key LIKE %s"] * len(batch))
+            params = [value for pid in batch for value in (pid, f"{pid}:%")]
+            cursor.execute(f"SELECT DISTINCT marque FROM {table} WHERE {condition}", params)
+            brands.update(row[0] for row in cursor.fetchall())
+        searched |= product_ids
+        new_brands = brands - loaded
+        if not new_brands:
+            break
+        for batch in _batches(new_brands):
+            condition, params = _brand_condition(batch)
+            cursor.execute(f"SELECT {', '.join(ROW_COLUMNS)} FROM {table} WHERE {condition}", params)
+            frame = pd.DataFrame(cursor.fetchall(), columns=ROW_COLUMNS)
+            product_ids.update(pid for pid in map(product_id, frame["lien"]) if pid is not None)
+            frames.append(frame)
+        loaded |= new_brands
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ROW_COLUMNS)
+
+
+def assign_canonical_ids(conn, table="produits_clean", threshold=0.75, brands=None, product_ids=None):
+    """
+    Recalcule les groupes et met à jour la colonne `canonical_id` (chargement dans une table
+    temporaire puis UPDATE ... JOIN sur `id`). Toute la table par défaut ; avec `brands` et
+    `product_ids` (marques et identifiants du delta), seulement les lignes de touched_rows.
+    Les lignes sans clé produit sont regroupées aussi. Renvoie (produits, groupes).
+    """
+    from bulk_load import upsert_frame
+
+    cursor = conn.cursor()
+    try:
+        if brands is None and product_ids is None:
+            cursor.execute(f"SELECT {', '.join(ROW_COLUMNS)} FROM {table}")
+            df = pd.DataFrame(cursor.fetchall(), columns=ROW_COLUMNS)
+        else:
+            df = touched_rows(cursor, table, brands or (), product_ids or ())
+        # Ligne sans clé : `id-<id>`, qui ne l'emporte jamais sur une vraie clé (R-p-... < id-...)
+        df["product_key"] = df["product_key"].where(df["product_key"].notna(), "id-" + df["id"].astype(str))
+        df["canonical_id"] = canonical_ids(df, threshold)
+
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS canonical_staging")
+        cursor.execute("""
+            CREATE TEMPORARY TABLE canonical_staging (
+                id INT PRIMARY KEY,
+                canonical_id VARCHAR(64)
+            )
+        """)
+        if len(df):
+            upsert_frame(cursor, "canonical_staging", df, ["id", "canonical_id"], key="id")
+        cursor.execute(f"""
+            UPDATE {table} t JOIN canonical_staging s ON s.id = t.id
+            SET t.canonical_id = s.canonical_id
+        """)
+        cursor.execute("DROP TEMPORARY TABLE canonical_staging")
+        conn.commit()
+    finally:
+        cursor.close()
+    return len(df), df["canonical_id"].nunique()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Regroupement des quasi-doublons de produits_clean")
+    parser.add_argument("--check", metavar="CSV", help="vérifier les paires connues sur un CSV nettoyé, sans MySQL")
+    args = parser.parse_args()
+    if args.check:
+        from database import product_key
+        df = pd.read_csv(args.check, sep=";", encoding="utf-8-sig")
+        if "product_key" not in df.columns:
+            df["product_key"] = df["lien"].map(product_key)
+        merged, split = check_known_pairs(df, canonical_ids(df))
+        for a, b in merged:
+            print(f"❌ {a} et {b} regroupés alors que ce sont deux produits différents.")
+        for pid in split:
+            print(f"❌ Les variantes de {pid} sont réparties dans plusieurs groupes.")
+        if merged or split:
+            raise SystemExit(1)
+        print(f"✅ Paires connues correctement séparées ({len(KNOWN_DISTINCT)} vérifiées).")
+    else:
+        from db_pool import get_connection
+        with get_connection() as conn:
+            nb_products, nb_groups = assign_canonical_ids(conn)
+        print(f"✅ {nb_products} produits regroupés en {nb_groups} produits canoniques.")
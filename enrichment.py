@@ -0,0 +1,293 @@
+"""
+Enrichissement à partir des fiches produit (colonne `lien`) : note moyenne, nombre d'avis,
+tailles proposées, tailles en stock. Les champs sont lus dans les données structurées
+JSON-LD (schema.org/Product) de la fiche et écrits dans la table `produits_details`.
+
+- Les fiches sont téléchargées en parallèle par un pool borné de threads (au plus `batch_size`
+  fiches en attente), avec la limite de débit par hôte de la frontière de crawl.
+- Les réponses sont gardées dans un cache disque (`cache_http/`). Pendant `ttl` secondes, une fiche
+  en cache n'est pas redemandée. Au-delà, elle est revalidée par une requête conditionnelle
+  (If-None-Match / If-Modified-Since) : un 304 réutilise le corps en cache sans le retélécharger.
+"""
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import mysql.connector
+from lxml import html as lxml_html
+from bulk_load import upsert_rows
+from db_pool import get_connection
+from fast_scraper import create_session
+from frontier import HOST_BURST, HOST_RATE, HostRateLimiter
+import metrics
+
+CACHE_DIR = "cache_http"
+CACHE_TTL = 24 * 3600  # Une fiche de moins d'un jour n'est pas redemandée
+
+DETAIL_COLUMNS = ["product_key", "note_moyenne", "nb_avis", "tailles", "tailles_en_stock", "en_stock", "fetched_at"]
+MAX_NOTE = 5  # Échelle de `note_moyenne` (DECIMAL(3,2))
+
+
+class HttpCache:
+    """
+    Cache disque des réponses HTTP : corps dans `<hash>.html`, métadonnées (ETag, Last-Modified,
+    date de téléchargement) dans `<hash>.json`. Les fichiers sont écrits sous un nom temporaire puis
+    renommés : une fiche en cache est toujours complète.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _paths(self, url):
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        folder = os.path.join(self.directory, digest[:2])
+        return os.path.join(folder, f"{digest}.json"), os.path.join(folder, f"{digest}.html")
+
+    @staticmethod
+    def _write(path, content):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def get(self, url):
+        """
+        (métadonnées, corps) de la réponse en cache, ou (None, None).
+        """
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def store(self, url, body, headers):
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        self._write(body_path, body)
+        self.touch(url, {"url": url, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")})
+
+    def touch(self, url, meta):
+        meta_path, _ = self._paths(url)
+        meta["fetched_at"] = time.time()
+        self._write(meta_path, json.dumps(meta).encode())
+
+    def fetch(self, session, url, limiter=None, timeout=15):
+        """
+        Corps de la page `url` et son origine : "cache" (encore fraîche), "revalidated" (304)
+        ou "fetched" (téléchargée). Seules les réponses 200 sont mises en cache.
+        """
+        meta, body = self.get(url)
+        if meta is not None and time.time() - meta["fetched_at"] < self.ttl:
+            return body, "cache"
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        if limiter is not None:
+            limiter.acquire(url)
+        with metrics.timer("enrich_fetch_seconds"):
+            response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and meta is not None:
+            self.touch(url, meta)
+            return body, "revalidated"
+        response.raise_for_status()
+        self.store(url, response.content, response.headers)
+        return response.content, "fetched"
+
+
+def _json_ld_products(tree):
+    """
+    Objets schema.org de type Product trouvés dans les scripts JSON-LD de la page.
+    """
+    for script in tree.xpath("//script[@type='application/ld+json']/text()"):
+        try:
+            data = json.loads(script)
+        except ValueError:
+            continue
+        items = data if isinstance(data, list) else data.get("@graph", [data]) if isinstance(data, dict) else []
+        for item in items:
+            types = item.get("@type") if isinstance(item, dict) else None
+            if types == "Product" or (isinstance(types, list) and "Product" in types):
+                yield item
+
+
+def _offers(product):
+    """
+    Offres (taille, en stock) du produit : offres directes, AggregateOffer ou variantes (hasVariant).
+    """
+    offers = product.get("offers") or []
+    offers = offers if isinstance(offers, list) else [offers]
+    for offer in offers:
+        if not isinstance(offer, dict):
+            continue  # Offre réduite à un texte ou une URL : ni taille ni disponibilité
+        if offer.get("@type") == "AggregateOffer" and offer.get("offers"):
+            yield from _offers({"offers": offer["offers"], "size": product.get("size")})
+            continue
+        size = offer.get("size") or product.get("size") or offer.get("name")
+        yield size, str(offer.get("availability", "")).endswith("InStock")
+    variants = product.get("hasVariant") or []
+    for variant in variants if isinstance(variants, list) else [variants]:
+        if isinstance(variant, dict):
+            yield from _offers(variant)
+
+
+def _number(value, kind=float):
+    """
+    Nombre lu dans le JSON-LD, écrit à la française si besoin ("4,5", "1 234"), ou None s'il est illisible.
+    """
+    if isinstance(value, str):
+        value = value.replace("\u00a0", "").replace("\u202f", "").replace(" ", "").replace(",", ".")
+    try:
+        return kind(float(value)) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _note(rating):
+    """
+    Note moyenne ramenée sur MAX_NOTE (d'après `bestRating` si la fiche note sur 10 ou sur 100),
+    ou None si elle est illisible ou hors de l'échelle.
+    """
+    note = _number(rating.get("ratingValue"))
+    best = _number(rating.get("bestRating"))
+    if note is not None and best and best != MAX_NOTE:
+        note = note * MAX_NOTE / best
+    if note is None or not 0 <= note <= MAX_NOTE:
+        return None
+    return round(note, 2)
+
+
+def parse_detail(page_html):
+    """
+    Champs de la fiche produit, ou None si la page n'a pas de données structurées Product.
+    """
+    if isinstance(page_html, bytes):
+        page_html = page_html.decode("utf-8", errors="replace")
+    product = next(_json_ld_products(lxml_html.fromstring(page_html)), None)
+    if product is None:
+        return None
+
+    rating = product.get("aggregateRating")
+    rating = rating if isinstance(rating, dict) else {}
+    offers = list(_offers(product))
+    sizes = list(dict.fromkeys(str(size) for size, _ in offers if size))
+    sizes_in_stock = list(dict.fromkeys(str(size) for size, in_stock in offers if size and in_stock))
+    nb_avis = _number(rating.get("reviewCount", rating.get("ratingCount")), int)
+    return {
+        "note_moyenne": _note(rating),
+        "nb_avis": nb_avis if nb_avis is None or nb_avis >= 0 else None,
+        "tailles": ", ".join(sizes)[:255] or None,
+        "tailles_en_stock": ", ".join(sizes_in_stock)[:255] or None,
+        "en_stock": int(any(in_stock for _, in_stock in offers)) if offers else None,
+    }
+
+
+def load_links(limit=None):
+    """
+    (clé produit, lien) des produits connus dans MySQL.
+    """
+    sql = "SELECT product_key, lien FROM produits WHERE product_key IS NOT NULL AND lien <> '' ORDER BY id"
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql + (" LIMIT %s" if limit else ""), (limit,) if limit else ())
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def save_details(rows):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            upsert_rows(cursor, "produits_details", DETAIL_COLUMNS, rows)
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+def enrich(links, max_workers=8, cache=None, to_mysql=True, rate=HOST_RATE, burst=HOST_BURST, batch_size=500):
+    """
+    Télécharge (ou relit en cache) la fiche de chaque (clé produit, lien) et enregistre les champs
+    extraits dans `produits_details`, par lots de `batch_size`. Renvoie (lignes, compteurs par origine).
+    """
+    cache = cache or HttpCache()
+    session = create_session(pool_size=max_workers)
+    limiter = HostRateLimiter(rate, burst)
+    stats = Counter()
+    all_rows = []
+    start = time.perf_counter()
+
+    def fetch_one(link):
+        _, url = link
+        try:
+            body, origin = cache.fetch(session, url, limiter)
+            # Une fiche dont les données structurées sont inexploitables ne doit pas arrêter le lot
+            return origin, parse_detail(body)
+        except Exception as e:
+            print(f"❌ Fiche {url} : {e}")
+            return "failed", None
+
+    links = list(links)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for offset in range(0, len(links), batch_size):
+                batch = links[offset:offset + batch_size]
+                fetched_at = datetime.datetime.now().replace(microsecond=0)
+                rows = []
+                for (key, _), (origin, details) in zip(batch, executor.map(fetch_one, batch)):
+                    stats[origin] += 1
+                    metrics.inc("enrich_pages_total", origin=origin)
+                    if details is None:
+                        if origin != "failed":
+                            stats["sans_donnees"] += 1
+                        continue
+                    rows.append((key, details["note_moyenne"], details["nb_avis"], details["tailles"],
+                                 details["tailles_en_stock"], details["en_stock"], fetched_at))
+                if to_mysql and rows:
+                    try:
+                        save_details(rows)
+                    except mysql.connector.Error as e:
+                        # Un lot refusé par MySQL n'arrête pas l'enrichissement des suivants
+                        stats["lots_en_erreur"] += 1
+                        metrics.inc("enrich_batches_failed_total")
+                        print(f"❌ Enregistrement d'un lot de {len(rows)} fiches : {e}")
+                all_rows.extend(rows)
+                print(f"🔎 {offset + len(batch)}/{len(links)} fiches traitées.")
+    finally:
+        session.close()
+
+    duration = time.perf_counter() - start
+    print(f"✅ Enrichissement : {len(all_rows)} fiches en {duration:.1f}s "
+          f"({stats['fetched']} téléchargées, {stats['revalidated']} revalidées (304), "
+          f"{stats['cache']} lues en cache, {stats['failed']} en échec, {stats['sans_donnees']} sans données, "
+          f"{stats['lots_en_erreur']} lots non enregistrés).")
+    return all_rows, stats
+
+
+def main(max_workers=8, ttl=CACHE_TTL, limit=None):
+    enrich(load_links(limit), max_workers=max_workers, cache=HttpCache(ttl=ttl))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Enrichissement des produits à partir de leurs fiches")
+    parser.add_argument("--workers", type=int, default=8, help="nombre de téléchargements en parallèle")
+    parser.add_argument("--ttl", type=int, default=CACHE_TTL, help="durée (s) pendant laquelle une fiche en cache n'est pas redemandée")
+    parser.add_argument("--limit", type=int, default=None, help="nombre maximal de produits")
+    args = parser.parse_args()
+    try:
+        main(args.workers, args.ttl, args.limit)
+    finally:
+        metrics.export("enrich")
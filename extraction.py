@@ -0,0 +1,98 @@
+"""
+Extraction des produits en un seul aller-retour WebDriver.
+
+Au lieu d'interroger chaque conteneur `dpb-holder` champ par champ (find_element, .text,
+get_attribute...), on exécute un unique script JavaScript dans la page qui renvoie tous les
+champs de tous les produits sous forme de dictionnaires simples.
+"""
+import metrics
+
+# Script exécuté dans le navigateur : un objet par conteneur produit.
+# Un champ absent de l'objet signifie que l'élément correspondant n'existe pas dans le conteneur
+# (on applique alors la valeur par défaut côté Python, comme le chemin élément par élément).
+EXTRACT_PRODUCTS_JS = """
+const text = (el) => (el.innerText || el.textContent || "").trim();
+return Array.from(document.getElementsByClassName("dpb-holder")).map((container) => {
+    const row = {};
+
+    const link = container.querySelector("a.dpb-product-model-link");
+    if (link) row.lien = link.href;
+
+    const title = container.querySelector("a.product-title");
+    const brand = title && title.querySelector("strong");
+    const name = title && title.querySelector("h2");
+    if (brand && name) {
+        row.marque = text(brand);
+        row.nom_produit = text(name);
+    }
+
+    const price = container.querySelector(".price-presentation .vtmn-price");
+    if (price) row.prix = text(price);
+
+    const rating = container.querySelector(".vtmn-rating");
+    if (rating) row.rating = rating.getAttribute("title");
+
+    const shipping = container.querySelector(".dpb-leadtime");
+    if (shipping) row.infos_livraison = text(shipping);
+
+    return row;
+});
+"""
+
+
+# Sélecteur CSS à l'origine de chaque champ (pour compter les champs manquants par sélecteur)
+FIELD_SELECTORS = {
+    "Marque": "a.product-title strong",
+    "Nom du produit": "a.product-title h2",
+    "Lien": "a.dpb-product-model-link",
+    "Prix": ".price-presentation .vtmn-price",
+    "Rating (nombre d'avis)": ".vtmn-rating",
+    "Infos de livraison": ".dpb-leadtime",
+}
+
+
+def missing_fields(record, default_rating="0", default_shipping="non spécifié"):
+    """
+    Sélecteurs dont le champ est vide ou a pris sa valeur par défaut dans `record`.
+    """
+    defaults = {"Rating (nombre d'avis)": default_rating, "Infos de livraison": default_shipping}
+    return [
+        selector for field, selector in FIELD_SELECTORS.items()
+        if not record.get(field) or record.get(field) == defaults.get(field)
+    ]
+
+
+def record_page_metrics(products_data):
+    """
+    Enregistre le nombre de produits de la page et les champs manquants par sélecteur.
+    """
+    metrics.observe("scrape_products_per_page", len(products_data))
+    for product in products_data:
+        for selector in missing_fields(product):
+            metrics.inc("scrape_missing_fields_total", selector=selector)
+
+
+def to_record(row, default_rating="0", default_shipping="non spécifié"):
+    """
+    Convertit un objet renvoyé par le script en dictionnaire au format des scrapers.
+    """
+    return {
+        "Marque": row.get("marque", ""),
+        "Nom du produit": row.get("nom_produit", ""),
+        "Lien": row.get("lien", ""),
+        "Prix": row.get("prix", ""),
+        "Rating (nombre d'avis)": row.get("rating", default_rating),
+        "Infos de livraison": row.get("infos_livraison", default_shipping),
+    }
+
+
+def extract_products_batch(driver, default_rating="0", default_shipping="non spécifié"):
+    """
+    Récupère tous les produits de la page courante en un seul appel execute_script.
+    Lève une exception si le script échoue ou renvoie un résultat inattendu
+    (l'appelant peut alors se rabattre sur l'extraction élément par élément).
+    """
+    rows = driver.execute_script(EXTRACT_PRODUCTS_JS)
+    if not isinstance(rows, list):
+        raise ValueError(f"résultat inattendu du script d'extraction : {type(rows).__name__}")
+    return [to_record(row, default_rating, default_shipping) for row in rows]
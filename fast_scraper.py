@@ -0,0 +1,154 @@
+"""
+Chemin rapide sans navigateur : téléchargement des pages de listing avec un client HTTP
+(connexions réutilisées) et analyse du HTML avec lxml, en utilisant les mêmes sélecteurs
+que le scraping Selenium.
+
+Si la page ne contient pas les conteneurs produits dans le HTML (rendu uniquement en
+JavaScript), parse_listing renvoie None et l'appelant doit repasser par Selenium.
+"""
+import re
+import time
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import html as lxml_html
+import metrics
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36 Edg/124.0"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "fr-FR,fr;q=0.9",
+}
+
+
+def _has_class(name):
+    """Équivalent XPath du sélecteur CSS `.name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+XPATH_CONTAINERS = f"//*[{_has_class('dpb-holder')}]"
+XPATH_LINK = f".//a[{_has_class('dpb-product-model-link')}]"
+XPATH_TITLE = f".//a[{_has_class('product-title')}]"
+XPATH_PRICE = f".//*[{_has_class('price-presentation')}]//*[{_has_class('vtmn-price')}]"
+XPATH_RATING = f".//*[{_has_class('vtmn-rating')}]"
+XPATH_SHIPPING = f".//*[{_has_class('dpb-leadtime')}]"
+
+# Nombre total de résultats : d'abord dans les données JSON embarquées, sinon dans le texte (« 512 produits »).
+# Seules les clés de comptage du moteur de recherche du listing : un "total" ou "totalCount" quelconque
+# (panier, avis, prix) donnerait un nombre de pages faux.
+TOTAL_JSON_RE = re.compile(r'"(?:nbHits|totalHits|numberOfResults)"\s*:\s*(\d+)')
+TOTAL_TEXT_RE = re.compile(r"(\d{1,3}(?:[\s\u202f\xa0.]?\d{3})*)\s+(?:produits|articles|résultats)\b", re.IGNORECASE)
+
+
+def create_session(pool_size=10, retries=2):
+    """
+    Crée une session HTTP avec un pool de connexions persistantes (keep-alive) et quelques retries.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504)),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+def listing_url(base_url, page_num, page_size=40):
+    """
+    URL d'une page de listing (paramètre 'from' calculé à partir du numéro de page).
+    """
+    return f"{base_url}?from={page_num * page_size}&size={page_size}"
+
+
+def _text(element):
+    # Même rendu que `.text.strip()` côté Selenium : espaces normalisés
+    return " ".join(element.text_content().split())
+
+
+def parse_listing(page_html, page_url="", default_rating="0", default_shipping="non spécifié"):
+    """
+    Extrait les produits d'une page de listing HTML et renvoie les mêmes dictionnaires que
+    scrape_products. Renvoie None si aucun conteneur produit n'est présent dans le HTML.
+    """
+    if isinstance(page_html, bytes):
+        page_html = page_html.decode("utf-8", errors="replace")
+    tree = lxml_html.fromstring(page_html)
+    containers = tree.xpath(XPATH_CONTAINERS)
+    if not containers:
+        return None
+
+    data = []
+    for container in containers:
+        links = container.xpath(XPATH_LINK)
+        product_link = urljoin(page_url, links[0].get("href", "")) if links else ""
+
+        brand, product_name = "", ""
+        titles = container.xpath(XPATH_TITLE)
+        if titles:
+            strong = titles[0].xpath(".//strong")
+            h2 = titles[0].xpath(".//h2")
+            if strong and h2:
+                brand, product_name = _text(strong[0]), _text(h2[0])
+
+        prices = container.xpath(XPATH_PRICE)
+        price = _text(prices[0]) if prices else ""
+
+        ratings = container.xpath(XPATH_RATING)
+        rating = ratings[0].get("title") if ratings else default_rating
+
+        shippings = container.xpath(XPATH_SHIPPING)
+        shipping = _text(shippings[0]) if shippings else default_shipping
+
+        data.append({
+            "Marque": brand,
+            "Nom du produit": product_name,
+            "Lien": product_link,
+            "Prix": price,
+            "Rating (nombre d'avis)": rating,
+            "Infos de livraison": shipping
+        })
+    return data
+
+
+def parse_total_count(page_html, min_count=0):
+    """
+    Nombre total de produits du listing annoncé dans la page, ou None s'il est introuvable.
+    Un total inférieur à `min_count` (nombre de produits déjà lus sur la première page) n'est pas
+    celui du listing : il est écarté.
+    """
+    if isinstance(page_html, bytes):
+        page_html = page_html.decode("utf-8", errors="replace")
+    match = TOTAL_JSON_RE.search(page_html)
+    if match:
+        total = int(match.group(1))
+    else:
+        match = TOTAL_TEXT_RE.search(_text(lxml_html.fromstring(page_html)))
+        total = int(re.sub(r"\D", "", match.group(1))) if match else None
+    if total is not None and total < min_count:
+        print(f"⚠ Total annoncé ({total}) inférieur aux {min_count} produits de la première page : ignoré.")
+        return None
+    return total
+
+
+def scrape_listing(session, url, timeout=15, default_rating="0", default_shipping="non spécifié"):
+    """
+    Télécharge une page de listing et en extrait les produits (None si la page nécessite JavaScript).
+    Une réponse autre que 200 lève requests.HTTPError.
+    """
+    with metrics.timer("scrape_page_load_seconds", backend="http"):
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        if response.status_code != 200:
+            raise requests.HTTPError(f"{response.status_code} pour {response.url}", response=response)
+    start = time.perf_counter()
+    products = parse_listing(response.content, response.url, default_rating, default_shipping)
+    if products is not None:
+        metrics.observe("scrape_extraction_seconds", time.perf_counter() - start, backend="http")
+    return products
@@ -0,0 +1,312 @@
+"""
+Frontière de crawl multi-catégories (chemin HTTP + lxml).
+
+- Les catégories viennent d'un fichier (une URL de listing par ligne) ou sont découvertes à partir
+  des liens d'une page d'amorce (menu, plan du site).
+- Chaque catégorie est une suite de pages de listing. La première page donne le nombre total de
+  produits : les pages suivantes sont alors toutes mises dans la file d'un coup, sinon elles sont
+  ajoutées une à une tant que la page précédente est complète.
+- Un pool de workers se partage la file de pages ; chaque requête prend d'abord un jeton dans le
+  seau de son hôte (token bucket) : le débit vers un même site reste plafonné quel que soit le
+  nombre de workers, et le débit total augmente avec le nombre de catégories et d'hôtes.
+- Un produit présent dans plusieurs catégories n'est transmis qu'une fois (clé produit). Toutes
+  ses catégories sont tout de même enregistrées dans la table `categories_produits`.
+"""
+import datetime
+import math
+import queue
+import threading
+import time
+from urllib.parse import urljoin, urlparse
+from lxml import html as lxml_html
+from bulk_load import upsert_rows
+from checkpoint import retry_with_backoff
+from database import PRODUCT_ID_RE, product_key
+from extraction import record_page_metrics
+from db_pool import get_connection
+from fast_scraper import create_session, listing_url, parse_listing, parse_total_count
+import metrics
+
+CATEGORIES_FILE = "categories.txt"
+
+# Débit par hôte : 2 requêtes/s en moyenne, rafales de 4 au plus
+HOST_RATE = 2.0
+HOST_BURST = 4
+
+MAPPING_COLUMNS = ["category_id", "product_key", "position", "seen_at"]
+
+
+class TokenBucket:
+    """
+    Seau à jetons : `rate` jetons par seconde, au plus `capacity` en réserve.
+    acquire() bloque jusqu'à ce qu'un jeton soit disponible.
+    """
+
+    def __init__(self, rate=HOST_RATE, capacity=HOST_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class HostRateLimiter:
+    """
+    Un seau à jetons par hôte, partagé par tous les workers.
+    """
+
+    def __init__(self, rate=HOST_RATE, burst=HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.setdefault(host, TokenBucket(self.rate, self.burst))
+        with metrics.timer("frontier_throttle_seconds", host=host):
+            bucket.acquire()
+
+
+def normalize_category(url):
+    """
+    URL de catégorie sans paramètres ni ancre (la pagination est ajoutée par listing_url).
+    """
+    parsed = urlparse(url.strip())
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip('/') or '/'}"
+
+
+def load_categories(path=CATEGORIES_FILE):
+    """
+    Lit les URLs de catégories d'un fichier texte (lignes vides et commentaires `#` ignorés, doublons retirés).
+    """
+    with open(path, encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    return list(dict.fromkeys(normalize_category(url) for url in urls))
+
+
+def discover_categories(seed_url, prefixes=None, session=None):
+    """
+    Découvre les catégories à partir des liens de la page `seed_url` : liens du même hôte, hors
+    fiches produit (`R-p-...`), dont le chemin commence par l'un des `prefixes` si donnés.
+    """
+    own_session = session is None
+    session = session or create_session()
+    try:
+        response = session.get(seed_url, timeout=15)
+        response.raise_for_status()
+    finally:
+        if own_session:
+            session.close()
+    host = urlparse(response.url).netloc
+    categories = []
+    for href in lxml_html.fromstring(response.content).xpath("//a/@href"):
+        url = urljoin(response.url, href)
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or parsed.netloc != host or PRODUCT_ID_RE.search(url):
+            continue
+        if prefixes and not any(parsed.path.startswith(prefix) for prefix in prefixes):
+            continue
+        categories.append(normalize_category(url))
+    categories = list(dict.fromkeys(categories))
+    print(f"🧭 {len(categories)} catégories découvertes sur {seed_url}.")
+    return categories
+
+
+class CrawlFrontier:
+    """
+    File de pages (catégorie, numéro de page) partagée par `num_workers` workers HTTP.
+    iter_pages() renvoie les produits nouveaux au fil de l'eau ; `mapping` contient ensuite
+    toutes les associations (catégorie, clé produit, position dans le listing).
+    """
+
+    def __init__(self, categories, num_workers=8, page_size=40, rate=HOST_RATE, burst=HOST_BURST,
+                 retries=3, max_pages=None):
+        self.categories = list(dict.fromkeys(normalize_category(url) for url in categories))
+        self.num_workers = max(1, num_workers)
+        self.page_size = page_size
+        self.retries = retries
+        self.max_pages = max_pages
+        self.limiter = HostRateLimiter(rate, burst)
+        self.tasks = queue.Queue()
+        # File de résultats bornée : les workers attendent si l'écriture prend du retard
+        self.results = queue.Queue(maxsize=self.num_workers * 4)
+        self.stop = threading.Event()  # Crawl interrompu : les workers abandonnent les pages restantes
+        self.lock = threading.Lock()
+        self.seen = set()
+        self.mapping = []
+        self.announced = set()  # Catégories dont toutes les pages ont été planifiées dès la première
+        self.stats = {"pages": 0, "failed": 0, "products": 0, "duplicates": 0}
+
+    def _schedule(self, category, page_num):
+        if not self.stop.is_set() and (self.max_pages is None or page_num < self.max_pages):
+            self.tasks.put((category, page_num))
+
+    def _put_result(self, item):
+        """
+        Transmet un résultat au consommateur, sauf si le crawl a été interrompu entre-temps.
+        """
+        while not self.stop.is_set():
+            try:
+                self.results.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _fetch(self, session, category, page_num):
+        url = listing_url(category, page_num, self.page_size)
+        self.limiter.acquire(url)
+        with metrics.timer("scrape_page_load_seconds", backend="frontier"):
+            response = session.get(url, timeout=15)
+        if response.status_code == 404 and page_num > 0:
+            return [], None  # Au-delà de la dernière page
+        response.raise_for_status()
+        products = parse_listing(response.content, response.url)
+        if products is None:
+            # Listing rendu uniquement en JavaScript : hors du périmètre du chemin HTTP
+            print(f"⚠ {category} : listing rendu en JavaScript, catégorie ignorée.")
+            return [], None
+        return products, parse_total_count(response.content, len(products)) if page_num == 0 else None
+
+    def _record(self, category, page_num, products):
+        """
+        Enregistre les associations catégorie → produit et renvoie les produits jamais vus, avec le
+        nombre de pages enregistrées jusque-là.
+        """
+        new_products = []
+        with self.lock:
+            for position, product in enumerate(products, start=page_num * self.page_size):
+                key = product_key(product["Lien"], product["Marque"], product["Nom du produit"])
+                if key is not None:
+                    self.mapping.append((category, key, position))
+                identity = key or product["Lien"]
+                if identity in self.seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                self.seen.add(identity)
+                new_products.append(product)
+            self.stats["pages"] += 1
+            self.stats["products"] += len(new_products)
+            pages = self.stats["pages"]
+        metrics.inc("frontier_duplicates_total", len(products) - len(new_products))
+        return new_products, pages
+
+    def _worker(self, worker_id, session):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                self.tasks.task_done()
+                return
+            if self.stop.is_set():
+                self.tasks.task_done()
+                continue
+            category, page_num = task
+            try:
+                products, total = retry_with_backoff(
+                    lambda: self._fetch(session, category, page_num), retries=self.retries,
+                    description=f"[worker {worker_id}] {category} page {page_num + 1}",
+                )
+                record_page_metrics(products)
+                if page_num == 0 and total:
+                    # Nombre de produits annoncé : toutes les pages restantes sont planifiées d'un coup
+                    self.announced.add(category)
+                    for next_page in range(1, math.ceil(total / self.page_size)):
+                        self._schedule(category, next_page)
+                elif category not in self.announced and len(products) >= self.page_size:
+                    # Sinon page par page, tant que la précédente est complète
+                    self._schedule(category, page_num + 1)
+                self._put_result((category, page_num, *self._record(category, page_num, products)))
+            except Exception as e:
+                with self.lock:
+                    self.stats["failed"] += 1
+                metrics.inc("scrape_pages_failed_total")
+                print(f"❌ [worker {worker_id}] {category} page {page_num + 1} : {e}")
+            finally:
+                self.tasks.task_done()
+
+    def iter_pages(self):
+        """
+        Générateur : (numéro d'ordre, produits nouveaux) pour chaque page récupérée, dans l'ordre
+        d'arrivée, à passer tel quel à pipeline.stream_to_storage.
+        """
+        for category in self.categories:
+            self._schedule(category, 0)
+        session = create_session(pool_size=self.num_workers)
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._worker, args=(i + 1, session), daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def close_queue():
+            # Toutes les pages (y compris celles ajoutées en cours de route) traitées : arrêt des workers
+            self.tasks.join()
+            for _ in threads:
+                self.tasks.put(None)
+            self._put_result(None)
+
+        threading.Thread(target=close_queue, daemon=True).start()
+        try:
+            for category, page_num, products, pages in iter(self.results.get, None):
+                print(f"✅ {category} page {page_num + 1} : {len(products)} produits nouveaux.")
+                if products:
+                    yield pages, products
+        finally:
+            # Fin normale ou interruption (erreur d'écriture, Ctrl-C) : pages restantes abandonnées
+            self.stop.set()
+            while True:
+                try:
+                    self.tasks.get_nowait()
+                except queue.Empty:
+                    break
+                self.tasks.task_done()
+            for _ in threads:
+                self.tasks.put(None)
+            for thread in threads:
+                thread.join()
+            session.close()
+        duration = time.perf_counter() - start
+        print(f"📊 Frontière : {len(self.categories)} catégories, {self.stats['pages']} pages "
+              f"({self.stats['failed']} en échec), {self.stats['products']} produits uniques, "
+              f"{self.stats['duplicates']} doublons écartés en {duration:.1f}s "
+              f"({self.stats['pages'] / (duration or 1e-9):.2f} pages/s).")
+
+    def save_mapping(self):
+        """
+        Enregistre les catégories et les associations catégorie → produit dans MySQL.
+        """
+        if not self.mapping:
+            return 0
+        seen_at = datetime.datetime.now().replace(microsecond=0)
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(
+                    "INSERT INTO categories (url, last_crawled_at) VALUES (%s, %s) "
+                    "ON DUPLICATE KEY UPDATE last_crawled_at = VALUES(last_crawled_at)",
+                    [(category, seen_at) for category in self.categories],
+                )
+                cursor.execute("SELECT url, category_id FROM categories")
+                ids = dict(cursor.fetchall())
+                rows = [(ids[category], key, position, seen_at) for category, key, position in self.mapping]
+                upsert_rows(cursor, "categories_produits", MAPPING_COLUMNS, rows, key="category_id")
+                conn.commit()
+            finally:
+                cursor.close()
+        print(f"🗂 {len(self.mapping)} associations catégorie → produit enregistrées.")
+        return len(self.mapping)
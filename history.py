@@ -0,0 +1,160 @@
+"""
+Historique compact des prix, avis et délais de livraison, passage de scraping par passage.
+
+- `scrape_runs` : un enregistrement par passage (début, fin, produits vus, changements).
+- `produits_historique` : une ligne par produit et par changement seulement (prix, rating ou
+  infos de livraison différents de la dernière observation), partitionnée par mois et indexée
+  par clé produit. Un produit dont rien ne change n'ajoute aucune ligne, quel que soit le
+  nombre de passages.
+- `produits_dernier_etat` : la dernière observation de chaque produit (une ligne par produit),
+  pour détecter les changements sans parcourir l'historique.
+
+À la fin d'un passage, tout `produits` est comparé à `produits_dernier_etat` (jointure sur la clé
+produit) : un passage interrompu avant sa clôture, ou une valeur réécrite à l'identique (qui ne
+change pas `updated_at`), ne fait donc perdre aucun changement. La migration 11 initialise
+`produits_dernier_etat` et l'historique avec les produits déjà présents.
+"""
+import datetime
+from aggregations import query
+from db_pool import get_connection
+
+TRACKED_COLUMNS = ("prix", "rating", "infos_livraison")
+
+
+def month_start(day):
+    return datetime.date(day.year, day.month, 1)
+
+
+def next_month(day):
+    return datetime.date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def ensure_partitions(cursor, until=None, months_ahead=2):
+    """
+    Crée les partitions mensuelles manquantes jusqu'à `months_ahead` mois après `until`
+    (la partition `pmax` est découpée : aucune donnée n'est déplacée tant qu'elle est vide).
+    """
+    cursor.execute("""
+        SELECT partition_name FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = 'produits_historique'
+    """)
+    existing = {(row[0].decode() if isinstance(row[0], bytes) else row[0]) for row in cursor.fetchall()}
+    day = month_start(until or datetime.date.today())
+    for _ in range(months_ahead + 1):
+        name = f"p{day:%Y%m}"
+        if name not in existing:
+            cursor.execute(f"""
+                ALTER TABLE produits_historique REORGANIZE PARTITION pmax INTO (
+                    PARTITION {name} VALUES LESS THAN ('{next_month(day)}'),
+                    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+                )
+            """)
+        day = next_month(day)
+
+
+def start_run(run_key=None):
+    """
+    Enregistre le début d'un passage de scraping ; renvoie son identifiant.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("INSERT INTO scrape_runs (run_key, started_at) VALUES (%s, NOW())", (run_key,))
+            run_id = cursor.lastrowid
+            conn.commit()
+        finally:
+            cursor.close()
+    return run_id
+
+
+def finish_run(run_id, nb_products=0):
+    """
+    Clôture le passage `run_id` : les produits dont le prix, le rating ou les infos de livraison
+    diffèrent de leur dernier état connu (ou qui n'en ont pas encore) sont ajoutés à l'historique.
+    Renvoie le nombre de changements enregistrés.
+    """
+    changed = " OR ".join(f"NOT (d.{c} <=> p.{c})" for c in TRACKED_COLUMNS)
+    columns = ", ".join(TRACKED_COLUMNS)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            ensure_partitions(cursor)
+
+            # Produits qui diffèrent de leur dernière valeur connue (ou produits nouveaux)
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS run_changes")
+            cursor.execute(f"""
+                CREATE TEMPORARY TABLE run_changes AS
+                SELECT p.product_key, {", ".join(f"p.{c}" for c in TRACKED_COLUMNS)}
+                FROM produits p
+                LEFT JOIN produits_dernier_etat d ON d.product_key = p.product_key
+                WHERE p.product_key IS NOT NULL AND (d.product_key IS NULL OR {changed})
+            """)
+            cursor.execute(f"""
+                INSERT INTO produits_historique (product_key, observed_at, run_id, {columns})
+                SELECT product_key, NOW(), %s, {columns} FROM run_changes
+            """, (run_id,))
+            nb_changes = cursor.rowcount
+            cursor.execute(f"""
+                INSERT INTO produits_dernier_etat (product_key, run_id, {columns})
+                SELECT product_key, %s, {columns} FROM run_changes
+                ON DUPLICATE KEY UPDATE run_id = VALUES(run_id),
+                    {", ".join(f"{c} = VALUES({c})" for c in TRACKED_COLUMNS)}
+            """, (run_id,))
+            cursor.execute("DROP TEMPORARY TABLE run_changes")
+            cursor.execute("""
+                UPDATE scrape_runs SET finished_at = NOW(), nb_products = %s, nb_changes = %s
+                WHERE run_id = %s
+            """, (nb_products, nb_changes, run_id))
+            conn.commit()
+        finally:
+            cursor.close()
+    print(f"🕓 Passage {run_id} : {nb_changes} changements de prix / avis / livraison enregistrés.")
+    return nb_changes
+
+
+# 📌 Requêtes sur l'historique
+
+def price_at(when, product_key=None):
+    """
+    Prix, rating et infos de livraison en vigueur à l'instant `when` : pour un produit, ou pour
+    tous les produits observés avant `when` (dernière observation de chacun).
+    """
+    if product_key is not None:
+        return query("""
+            SELECT product_key, observed_at, run_id, prix, rating, infos_livraison
+            FROM produits_historique
+            WHERE product_key = %s AND observed_at <= %s
+            ORDER BY observed_at DESC LIMIT 1
+        """, (product_key, when))
+    return query("""
+        SELECT product_key, observed_at, run_id, prix, rating, infos_livraison FROM (
+            SELECT h.*, ROW_NUMBER() OVER (PARTITION BY product_key ORDER BY observed_at DESC) AS rang
+            FROM produits_historique h
+            WHERE observed_at <= %s
+        ) derniers
+        WHERE rang = 1
+    """, (when,))
+
+
+def changes_since(run_id):
+    """
+    Changements enregistrés après le passage `run_id`, avec la valeur précédente de chaque colonne
+    (NULL pour un produit apparu depuis).
+    """
+    return query("""
+        SELECT * FROM (
+            SELECT h.product_key, h.observed_at, h.run_id,
+                   LAG(h.prix) OVER w AS prix_precedent, h.prix,
+                   LAG(h.rating) OVER w AS rating_precedent, h.rating,
+                   LAG(h.infos_livraison) OVER w AS livraison_precedente, h.infos_livraison
+            FROM produits_historique h
+            WHERE h.product_key IN (SELECT product_key FROM produits_historique WHERE run_id > %s)
+            WINDOW w AS (PARTITION BY h.product_key ORDER BY h.observed_at)
+        ) changements
+        WHERE run_id > %s
+        ORDER BY observed_at, product_key
+    """, (run_id, run_id))
+
+
+def runs():
+    return query("SELECT * FROM scrape_runs ORDER BY run_id")
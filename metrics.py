@@ -0,0 +1,155 @@
+"""
+Métriques du pipeline (scraping, insertion, nettoyage, rapport).
+
+Les étapes enregistrent des compteurs, des jauges et des mesures (durées, produits par page...)
+dans un registre partagé par le processus. En fin d'exécution, le point d'entrée lancé (orchestrator,
+ou le bloc __main__ d'un module exécuté seul) appelle export() une seule fois, qui écrit :
+- une ligne JSON par série dans `metriques/metrics.jsonl` (fichier cumulé d'un passage à l'autre,
+  pour repérer les régressions) ;
+- un fichier texte au format Prometheus `metriques/metrics.prom` (collecteur textfile de node_exporter).
+Le dossier peut être changé avec la variable d'environnement METRICS_DIR.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = os.environ.get("METRICS_DIR", "metriques")
+
+
+class MetricsRegistry:
+    """
+    Registre thread-safe : compteurs, jauges et résumés (nombre, somme, min, max) par nom + labels.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.summaries = {}
+        self.help = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self.summaries.setdefault(key, {"count": 0, "sum": 0.0, "min": value, "max": value})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Mesure la durée du bloc `with` (en secondes) dans le résumé `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """
+        Liste de dictionnaires (une entrée par série), prête à être sérialisée en JSON.
+        """
+        with self._lock:
+            series = [{"type": "counter", "name": n, "labels": dict(l), "value": v} for (n, l), v in self.counters.items()]
+            series += [{"type": "gauge", "name": n, "labels": dict(l), "value": v} for (n, l), v in self.gauges.items()]
+            series += [{"type": "summary", "name": n, "labels": dict(l), **s} for (n, l), s in self.summaries.items()]
+        return series
+
+    def to_prometheus(self):
+        """
+        Format texte Prometheus : compteurs et jauges tels quels, résumés en _sum / _count
+        (plus deux jauges _min / _max).
+        """
+        def labels_text(labels):
+            if not labels:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in labels.values())
+            return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+        families = {}  # nom -> (type, [lignes]) ; les lignes d'une même métrique doivent se suivre
+        def add(name, kind, suffix, labels, value):
+            families.setdefault(name, (kind, []))[1].append(f"{name}{suffix}{labels_text(labels)} {value}")
+
+        for entry in sorted(self.snapshot(), key=lambda e: (e["name"], sorted(e["labels"].items()))):
+            name, labels = entry["name"], entry["labels"]
+            if entry["type"] == "summary":
+                # _sum et _count forment le résumé ; min et max sont exposés comme jauges à part
+                add(name, "summary", "_sum", labels, entry["sum"])
+                add(name, "summary", "_count", labels, entry["count"])
+                add(f"{name}_min", "gauge", "", labels, entry["min"])
+                add(f"{name}_max", "gauge", "", labels, entry["max"])
+            else:
+                add(name, entry["type"], "", labels, entry["value"])
+
+        lines = []
+        for name, (kind, samples) in families.items():
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def export(self, stage, directory=None):
+        """
+        Ajoute les séries au fichier JSON lines et réécrit le fichier Prometheus.
+        """
+        directory = directory or METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(os.path.join(directory, "metrics.jsonl"), "a", encoding="utf-8") as f:
+            for entry in self.snapshot():
+                f.write(json.dumps({"time": timestamp, "stage": stage, **entry}, ensure_ascii=False) + "\n")
+        prom_path = os.path.join(directory, "metrics.prom")
+        with open(f"{prom_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(f"{prom_path}.tmp", prom_path)
+        print(f"📈 Métriques exportées dans {directory}/ (metrics.jsonl, metrics.prom)")
+
+
+# Registre partagé par tout le processus
+registry = MetricsRegistry()
+inc = registry.inc
+set_gauge = registry.set
+observe = registry.observe
+timer = registry.timer
+export = registry.export
+
+registry.describe("scrape_page_load_seconds", "Durée de chargement d'une page de listing")
+registry.describe("scrape_extraction_seconds", "Durée d'extraction des produits d'une page")
+registry.describe("scrape_wait_seconds", "Durée des attentes conditionnelles (grille, cookies)")
+registry.describe("scrape_products_per_page", "Nombre de produits extraits par page")
+registry.describe("scrape_missing_fields_total", "Champs vides ou par défaut, par sélecteur")
+registry.describe("scrape_pages_failed_total", "Pages en erreur")
+registry.describe("insert_rows_total", "Lignes envoyées à MySQL")
+registry.describe("insert_rows_per_second", "Débit d'insertion MySQL par lot")
+registry.describe("clean_duration_seconds", "Durée d'un passage de nettoyage")
+registry.describe("clean_rows_per_second", "Débit du nettoyage")
+registry.describe("clean_peak_rss_mb", "Pic de mémoire du processus de nettoyage (Mo)")
+registry.describe("report_duration_seconds", "Durée de génération du rapport")
+registry.describe("report_figures_total", "Figures redessinées ou reprises du cache")
+registry.describe("pipeline_stage_seconds", "Durée de chaque étape de l'orchestrateur")
+registry.describe("frontier_throttle_seconds", "Attente d'un jeton de la limite de débit, par hôte")
+registry.describe("frontier_duplicates_total", "Produits déjà vus dans une autre catégorie")
+registry.describe("enrich_fetch_seconds", "Durée de téléchargement d'une fiche produit")
+registry.describe("enrich_pages_total", "Fiches produit par origine (cache, 304, téléchargée, échec)")
@@ -0,0 +1,326 @@
+"""
+Migrations versionnées du schéma `scraping_db`.
+
+Chaque migration a un numéro de version et n'est appliquée qu'une seule fois : les versions
+appliquées sont enregistrées dans la table `schema_migrations`. Les migrations vérifient l'état
+réel du schéma (information_schema) avant de le modifier, pour fonctionner aussi bien sur une base
+neuve que sur une base créée avec une ancienne version de scraping_db.sql.
+
+Elles sont appliquées automatiquement à la création du pool de connexions (voir db_pool.get_pool),
+ou à la main avec `python migrations.py`.
+"""
+
+# Extraction de la clé produit en SQL (même règle que database.product_key : clé de repli `h-` + SHA-1
+# du lien, ou de la marque et du nom, sans identifiant R-p-)
+PRODUCT_KEY_SQL = """CASE WHEN lien REGEXP 'R-p-[0-9A-Za-z]' THEN CONCAT_WS(':',
+    REGEXP_SUBSTR(lien, 'R-p-[0-9A-Za-z]+'),
+    REGEXP_SUBSTR(REGEXP_SUBSTR(lien, '[?&]mc=[^&#]+'), '[^=]+$'))
+    WHEN COALESCE(lien, '') <> '' THEN CONCAT('h-', LEFT(SHA1(lien), 20))
+    WHEN COALESCE(marque, '') <> '' OR COALESCE(nom_produit, '') <> ''
+        THEN CONCAT('h-', LEFT(SHA1(CONCAT_WS('|', marque, nom_produit)), 20))
+    ELSE NULL END"""
+
+
+def column_type(cursor, table, column):
+    """
+    Type SQL d'une colonne (ex. "varchar"), ou None si la colonne n'existe pas.
+    """
+    cursor.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    row = cursor.fetchone()
+    return row[0].decode() if row and isinstance(row[0], bytes) else (row[0] if row else None)
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+def add_index(cursor, table, index, definition):
+    if not index_exists(cursor, table, index):
+        cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+
+
+def add_product_key(cursor, table):
+    """
+    Ajoute la colonne product_key, la remplit à partir du lien, supprime les doublons
+    (on garde la ligne la plus récente) puis crée l'index unique.
+    """
+    if column_type(cursor, table, "product_key") is None:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN product_key VARCHAR(64) AFTER id")
+    cursor.execute(f"UPDATE {table} SET product_key = {PRODUCT_KEY_SQL} WHERE product_key IS NULL")
+    cursor.execute(f"""
+        DELETE t1 FROM {table} t1 JOIN {table} t2
+        ON t1.product_key = t2.product_key AND t1.id < t2.id
+    """)
+    add_index(cursor, table, f"uq_{table}_product_key", f"UNIQUE KEY uq_{table}_product_key (product_key)")
+
+
+# 📌 Les migrations, dans l'ordre
+
+def migration_1_base_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS produits (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            marque VARCHAR(255),
+            nom_produit VARCHAR(255),
+            lien TEXT,
+            prix VARCHAR(50),
+            rating VARCHAR(50),
+            infos_livraison VARCHAR(255)
+        )
+    """)
+
+
+def migration_2_product_key(cursor):
+    add_product_key(cursor, "produits")
+
+
+def migration_3_updated_at(cursor):
+    if column_type(cursor, "produits", "updated_at") is None:
+        cursor.execute("""
+            ALTER TABLE produits
+            ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        """)
+    add_index(cursor, "produits", "idx_produits_updated_at", "KEY idx_produits_updated_at (updated_at)")
+
+
+def migration_4_clean_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etl_watermarks (
+            stage VARCHAR(64) PRIMARY KEY,
+            last_updated_at TIMESTAMP NULL,
+            run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS produits_clean (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            product_key VARCHAR(64),
+            marque VARCHAR(255),
+            nom_produit VARCHAR(255),
+            lien TEXT,
+            prix FLOAT,
+            rating VARCHAR(50) DEFAULT '0',
+            infos_livraison VARCHAR(255) DEFAULT 'non spécifié'
+        )
+    """)
+    add_product_key(cursor, "produits_clean")
+
+
+def migration_5_numeric_types(cursor):
+    """
+    prix et rating passent de VARCHAR à DECIMAL / INT (les valeurs existantes sont converties).
+    """
+    if column_type(cursor, "produits", "prix") == "varchar":
+        # "129,99€" -> "129.99" ; chaîne vide -> NULL
+        cursor.execute("""
+            UPDATE produits
+            SET prix = NULLIF(REPLACE(REGEXP_REPLACE(prix, '[^0-9,.]', ''), ',', '.'), '')
+        """)
+        cursor.execute("ALTER TABLE produits MODIFY prix DECIMAL(10,2)")
+    if column_type(cursor, "produits", "rating") == "varchar":
+        cursor.execute("UPDATE produits SET rating = COALESCE(NULLIF(REGEXP_REPLACE(rating, '[^0-9]', ''), ''), '0')")
+        cursor.execute("ALTER TABLE produits MODIFY rating INT NOT NULL DEFAULT 0")
+
+    if column_type(cursor, "produits_clean", "prix") != "decimal":
+        cursor.execute("ALTER TABLE produits_clean MODIFY prix DECIMAL(10,2)")
+    if column_type(cursor, "produits_clean", "rating") == "varchar":
+        cursor.execute("UPDATE produits_clean SET rating = COALESCE(NULLIF(REGEXP_REPLACE(rating, '[^0-9]', ''), ''), '0')")
+        cursor.execute("ALTER TABLE produits_clean MODIFY rating INT NOT NULL DEFAULT 0")
+
+
+def migration_6_indexes(cursor):
+    """
+    Index pour les requêtes d'analyse : par marque, par mode de livraison et par tranche de prix.
+    """
+    add_index(cursor, "produits", "idx_produits_marque", "KEY idx_produits_marque (marque)")
+    add_index(cursor, "produits", "idx_produits_livraison", "KEY idx_produits_livraison (infos_livraison)")
+    add_index(cursor, "produits_clean", "idx_produits_clean_marque_prix", "KEY idx_produits_clean_marque_prix (marque, prix)")
+    add_index(cursor, "produits_clean", "idx_produits_clean_prix", "KEY idx_produits_clean_prix (prix)")
+    add_index(cursor, "produits_clean", "idx_produits_clean_livraison", "KEY idx_produits_clean_livraison (infos_livraison)")
+
+
+def migration_7_canonical_id(cursor):
+    """
+    Identifiant canonique des quasi-doublons (rempli par dedup.assign_canonical_ids).
+    """
+    if column_type(cursor, "produits_clean", "canonical_id") is None:
+        cursor.execute("ALTER TABLE produits_clean ADD COLUMN canonical_id VARCHAR(64) AFTER product_key")
+    add_index(cursor, "produits_clean", "idx_produits_clean_canonical", "KEY idx_produits_clean_canonical (canonical_id)")
+
+
+def migration_8_history(cursor):
+    """
+    Passages de scraping et historique des prix / avis / livraison (voir history.py).
+    L'historique est partitionné par mois sur observed_at ; les partitions mensuelles sont
+    ajoutées au fil de l'eau par history.ensure_partitions.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_runs (
+            run_id INT AUTO_INCREMENT PRIMARY KEY,
+            run_key VARCHAR(32),
+            started_at DATETIME NOT NULL,
+            finished_at DATETIME NULL,
+            nb_products INT NOT NULL DEFAULT 0,
+            nb_changes INT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS produits_historique (
+            product_key VARCHAR(64) NOT NULL,
+            observed_at DATETIME NOT NULL,
+            run_id INT NOT NULL,
+            prix DECIMAL(10,2),
+            rating INT NOT NULL DEFAULT 0,
+            infos_livraison VARCHAR(255),
+            PRIMARY KEY (product_key, observed_at),
+            KEY idx_produits_historique_run (run_id)
+        )
+        PARTITION BY RANGE COLUMNS (observed_at) (
+            PARTITION pmax VALUES LESS THAN (MAXVALUE)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS produits_dernier_etat (
+            product_key VARCHAR(64) PRIMARY KEY,
+            run_id INT NOT NULL,
+            prix DECIMAL(10,2),
+            rating INT NOT NULL DEFAULT 0,
+            infos_livraison VARCHAR(255)
+        )
+    """)
+
+
+def migration_9_categories(cursor):
+    """
+    Catégories crawlées et association catégorie → produit (voir frontier.py).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            category_id INT AUTO_INCREMENT PRIMARY KEY,
+            url VARCHAR(500) NOT NULL,
+            last_crawled_at DATETIME NULL,
+            UNIQUE KEY uq_categories_url (url)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categories_produits (
+            category_id INT NOT NULL,
+            product_key VARCHAR(64) NOT NULL,
+            position INT NOT NULL DEFAULT 0,
+            seen_at DATETIME NOT NULL,
+            PRIMARY KEY (category_id, product_key),
+            KEY idx_categories_produits_product (product_key)
+        )
+    """)
+
+
+def migration_10_product_details(cursor):
+    """
+    Champs lus sur les fiches produit (voir enrichment.py).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS produits_details (
+            product_key VARCHAR(64) PRIMARY KEY,
+            note_moyenne DECIMAL(3,2),
+            nb_avis INT,
+            tailles VARCHAR(255),
+            tailles_en_stock VARCHAR(255),
+            en_stock TINYINT(1),
+            fetched_at DATETIME NOT NULL
+        )
+    """)
+
+
+def migration_11_seed_history(cursor):
+    """
+    État initial de l'historique : les produits déjà présents dans `produits` (avant la migration 8,
+    ou jamais rapprochés depuis) y entrent avec leurs valeurs actuelles, comme passage 0.
+    """
+    columns = "prix, rating, infos_livraison"
+    cursor.execute(f"""
+        INSERT IGNORE INTO produits_historique (product_key, observed_at, run_id, {columns})
+        SELECT p.product_key, COALESCE(p.updated_at, NOW()), 0, p.prix, p.rating, p.infos_livraison
+        FROM produits p
+        LEFT JOIN produits_dernier_etat d ON d.product_key = p.product_key
+        WHERE p.product_key IS NOT NULL AND d.product_key IS NULL
+    """)
+    cursor.execute(f"""
+        INSERT IGNORE INTO produits_dernier_etat (product_key, run_id, {columns})
+        SELECT product_key, 0, {columns} FROM produits WHERE product_key IS NOT NULL
+    """)
+
+
+def migration_12_fallback_keys(cursor):
+    """
+    Clé de repli pour les produits sans identifiant R-p- (restés à NULL) et suppression de leurs doublons.
+    """
+    add_product_key(cursor, "produits")
+    add_product_key(cursor, "produits_clean")
+
+
+MIGRATIONS = [
+    (1, "tables de base", migration_1_base_tables),
+    (2, "clé produit unique sur produits", migration_2_product_key),
+    (3, "date de mise à jour des produits", migration_3_updated_at),
+    (4, "tables produits_clean et etl_watermarks", migration_4_clean_tables),
+    (5, "prix DECIMAL et rating INT", migration_5_numeric_types),
+    (6, "index marque, livraison et prix", migration_6_indexes),
+    (7, "identifiant canonique des quasi-doublons", migration_7_canonical_id),
+    (8, "passages de scraping et historique des prix", migration_8_history),
+    (9, "catégories et association catégorie / produit", migration_9_categories),
+    (10, "détails des fiches produit", migration_10_product_details),
+    (11, "état initial de l'historique des prix", migration_11_seed_history),
+    (12, "clé de repli des produits sans identifiant", migration_12_fallback_keys),
+]
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply_migrations(conn):
+    """
+    J'applique, dans l'ordre, les migrations pas encore enregistrées dans `schema_migrations`.
+    Renvoie la liste des versions appliquées pendant cet appel.
+    """
+    cursor = conn.cursor()
+    applied = []
+    try:
+        done = applied_versions(cursor)
+        for version, description, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            print(f"🛠 Migration {version} : {description}...")
+            migrate(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            conn.commit()
+            applied.append(version)
+    finally:
+        cursor.close()
+    return applied
+
+
+if __name__ == "__main__":
+    # get_pool() applique déjà les migrations en attente à la création du pool
+    from db_pool import get_connection
+    with get_connection() as conn:
+        apply_migrations(conn)
+    print("✅ Schéma à jour.")
@@ -0,0 +1,138 @@
+"""
+Point d'entrée unique du pipeline : scraping, nettoyage et rapport dans un seul processus.
+
+    python orchestrator.py scrape | clean | report | all | enrich
+
+Avec `all`, les données passent d'une étape à l'autre en mémoire : les produits scrappés sont
+nettoyés directement comme un delta (sans relire `produits` avec SELECT *), et le rapport est calculé
+à partir du DataFrame nettoyé (sans relire `produits_clean`). Chaque étape écrit toujours dans MySQL,
+les CSV et le Parquet comme les scripts séparés. Avec `--full` ou `--from-parquet`, le nettoyage relit
+ses données dans MySQL ou le Parquet comme `clean`.
+
+Les modules de chaque étape (Selenium pour le scraping, matplotlib/seaborn pour le rapport) ne
+sont importés que si l'étape est exécutée. La durée de chaque étape est affichée à la fin.
+`enrich` (fiches produit, voir enrichment.py) reste une commande à part : elle n'est pas
+nécessaire au rapport et peut tourner à un autre rythme que le scraping.
+"""
+import time
+import metrics
+from checkpoint import STATE_FILE
+
+
+class StageTimer:
+    """
+    Mesure la durée de chaque étape (affichée à la fin et exportée dans les métriques).
+    """
+
+    def __init__(self):
+        self.durations = {}
+
+    def run(self, stage, func, *args, **kwargs):
+        print(f"▶ Étape {stage}...")
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            self.durations[stage] = duration
+            metrics.observe("pipeline_stage_seconds", duration, stage=stage)
+
+    def print_summary(self):
+        print("⏱ Durée des étapes :")
+        for stage, duration in self.durations.items():
+            print(f"   {stage:<8} {duration:8.2f}s")
+        print(f"   {'total':<8} {sum(self.durations.values()):8.2f}s")
+
+
+def run_scrape(args, keep=False):
+    import projet
+    categories = projet.resolve_categories(args.categories, args.discover, args.prefix)
+    return projet.main(num_workers=args.workers, use_browser=args.browser, lean=args.lean,
+                       state_file=args.state, restart=args.restart, keep=keep, categories=categories)
+
+
+def run_clean(args, raw=None, raw_since=None, keep=False):
+    import data_cleaning
+    return data_cleaning.main(full=args.full, chunksize=args.chunksize, from_parquet=args.from_parquet,
+                              raw=raw, raw_since=raw_since, keep=keep)
+
+
+def run_report(args, df=None):
+    import report
+    return report.main(args.output, max_workers=args.report_workers, df=df)
+
+
+def run_enrich(args):
+    import enrichment
+    return enrichment.main(max_workers=args.enrich_workers, ttl=args.ttl, limit=args.limit)
+
+
+def main(args):
+    timer = StageTimer()
+    try:
+        if args.command == "scrape":
+            timer.run("scrape", run_scrape, args)
+        elif args.command == "clean":
+            timer.run("clean", run_clean, args)
+        elif args.command == "report":
+            timer.run("report", run_report, args)
+        elif args.command == "enrich":
+            timer.run("enrich", run_enrich, args)
+        else:
+            in_memory = not (args.full or args.from_parquet)
+            raw_since = None
+            if in_memory:
+                import data_cleaning
+                # Heure de début du passage : le nettoyage vérifie qu'aucune ligne plus ancienne n'attend
+                raw_since = data_cleaning.server_time()
+            raw = timer.run("scrape", run_scrape, args, keep=in_memory)
+            if in_memory and (raw is None or raw.empty):
+                print("❌ Aucun produit scrappé : nettoyage et rapport annulés.")
+                return
+            cleaned = timer.run("clean", run_clean, args, raw=raw, raw_since=raw_since, keep=True)
+            del raw
+            timer.run("report", run_report, args, df=cleaned)
+    finally:
+        timer.print_summary()
+        metrics.export(args.command)
+
+
+def build_parser():
+    import argparse
+    parser = argparse.ArgumentParser(description="Pipeline produits Decathlon : scraping, nettoyage, rapport")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scrape = argparse.ArgumentParser(add_help=False)
+    scrape.add_argument("--browser", action="store_true", help="forcer le scraping via Selenium")
+    scrape.add_argument("--workers", type=int, default=1, help="nombre de sessions navigateur en parallèle")
+    scrape.add_argument("--lean", action="store_true", help="navigateur headless, ressources bloquées, profil persistant")
+    scrape.add_argument("--state", default=STATE_FILE, help="fichier d'état pour la reprise du crawl")
+    scrape.add_argument("--restart", action="store_true", help="ignorer le fichier d'état et tout recharger")
+    scrape.add_argument("--categories", help="fichier d'URLs de catégories (une par ligne) à crawler")
+    scrape.add_argument("--discover", help="page dont les liens de catégories sont à crawler")
+    scrape.add_argument("--prefix", action="append", help="préfixe de chemin des catégories découvertes")
+
+    clean = argparse.ArgumentParser(add_help=False)
+    clean.add_argument("--full", action="store_true", help="reconstruire entièrement produits_clean")
+    clean.add_argument("--chunksize", type=int, default=50_000, help="nombre de lignes par morceau")
+    clean.add_argument("--from-parquet", action="store_true", help="lire les données brutes depuis le stockage Parquet")
+
+    report = argparse.ArgumentParser(add_help=False)
+    report.add_argument("--output", default="rapports", help="dossier de sortie du rapport")
+    report.add_argument("--report-workers", type=int, default=None, help="nombre de processus de rendu")
+
+    enrich = argparse.ArgumentParser(add_help=False)
+    enrich.add_argument("--enrich-workers", type=int, default=8, help="téléchargements de fiches en parallèle")
+    enrich.add_argument("--ttl", type=int, default=24 * 3600, help="durée (s) pendant laquelle une fiche en cache n'est pas redemandée")
+    enrich.add_argument("--limit", type=int, default=None, help="nombre maximal de fiches")
+
+    subparsers.add_parser("scrape", parents=[scrape], help="scraping des pages de listing")
+    subparsers.add_parser("clean", parents=[clean], help="nettoyage de la table produits")
+    subparsers.add_parser("report", parents=[report], help="rapport HTML et graphiques")
+    subparsers.add_parser("all", parents=[scrape, clean, report], help="les trois étapes, données passées en mémoire")
+    subparsers.add_parser("enrich", parents=[enrich], help="détails des fiches produit (tailles, stock, note)")
+    return parser
+
+
+if __name__ == "__main__":
+    main(build_parser().parse_args())
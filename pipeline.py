@@ -0,0 +1,118 @@
+"""
+Pipeline de scraping en flux : les pages produites par un générateur sont transmises, via une
+file bornée, à un thread d'écriture qui les enregistre par lots dans le CSV et dans MySQL.
+
+L'écriture se fait donc pendant le chargement des pages suivantes, et la mémoire reste bornée
+(au plus `max_pending_pages` pages en attente + un lot en cours) quel que soit le nombre de pages.
+"""
+import csv
+import os
+import queue
+import threading
+from database import insert_into_mysql
+from bulk_load import BULK_MIN_ROWS, bulk_available
+import columnar
+
+FIELDNAMES = ["Marque", "Nom du produit", "Lien", "Prix", "Rating (nombre d'avis)", "Infos de livraison"]
+SMALL_BATCH_SIZE = 200
+
+
+def default_batch_size(to_mysql=True):
+    """
+    Taille des lots écrits : BULK_MIN_ROWS quand les lots vont dans MySQL et que LOAD DATA LOCAL
+    est utilisable (chaque lot passe alors par le chargement en masse + fusion), sinon SMALL_BATCH_SIZE.
+    """
+    return max(BULK_MIN_ROWS, SMALL_BATCH_SIZE) if to_mysql and bulk_available(BULK_MIN_ROWS) else SMALL_BATCH_SIZE
+
+
+class CsvAppender:
+    """
+    Écrit les produits dans un CSV (séparateur ';', UTF-8 avec BOM) au fur et à mesure.
+    Par défaut le fichier est recréé ; avec append=True les lignes sont ajoutées au fichier existant.
+    """
+
+    def __init__(self, filename, append=False):
+        self.filename = filename
+        has_header = append and os.path.exists(filename) and os.path.getsize(filename) > 0
+        self.file = open(filename, "a" if append else "w", encoding="utf-8-sig", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDNAMES, delimiter=";", extrasaction="ignore")
+        if not has_header:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _writer_loop(pending, batch_size, csv_writer, to_mysql, parquet_dir, run_id, stats):
+    """
+    Consomme la file jusqu'au marqueur de fin (None) et écrit les produits par lots de `batch_size`.
+    """
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        try:
+            if csv_writer is not None:
+                csv_writer.write(batch)
+            if parquet_dir:
+                # Un fichier Parquet par lot dans la partition du passage (numéroté à part : un lot en
+                # erreur côté MySQL ne doit pas faire réécrire son fichier par le lot suivant)
+                columnar.write_run(batch, run_id=run_id, part=stats["parts"], base_dir=parquet_dir)
+                stats["parts"] += 1
+            if to_mysql:
+                insert_into_mysql(batch)
+            stats["written"] += len(batch)
+            stats["batches"] += 1
+        except Exception as e:
+            # On continue à vider la file pour ne pas bloquer le scraping
+            stats["errors"] += 1
+            print(f"❌ Erreur lors de l'écriture d'un lot de {len(batch)} produits : {e}")
+        batch.clear()
+
+    while True:
+        products_data = pending.get()
+        if products_data is None:
+            flush()
+            return
+        batch.extend(products_data)
+        if len(batch) >= batch_size:
+            flush()
+
+
+def stream_to_storage(pages, batch_size=None, max_pending_pages=4, csv_filename="products.csv",
+                      append=False, to_mysql=True, parquet_dir=None, run_id=None):
+    """
+    Consomme un générateur de (numéro de page, produits) et écrit les produits par lots dans le CSV,
+    dans MySQL et (si `parquet_dir` est donné) dans la partition Parquet du passage `run_id`,
+    depuis un thread dédié. Renvoie le nombre total de produits reçus.
+    Sans `batch_size`, les lots sont dimensionnés par default_batch_size.
+    """
+    batch_size = batch_size or default_batch_size(to_mysql)
+    pending = queue.Queue(maxsize=max_pending_pages)  # File bornée : le scraping attend si l'écriture prend du retard
+    stats = {"written": 0, "batches": 0, "errors": 0, "parts": 0}
+    csv_writer = CsvAppender(csv_filename, append=append) if csv_filename else None
+    run_id = run_id or columnar.new_run_id()
+    writer = threading.Thread(target=_writer_loop,
+                              args=(pending, batch_size, csv_writer, to_mysql, parquet_dir, run_id, stats))
+    writer.start()
+
+    total = 0
+    try:
+        for _, products_data in pages:
+            if products_data:
+                total += len(products_data)
+                pending.put(products_data)
+    finally:
+        pending.put(None)
+        writer.join()
+        if csv_writer is not None:
+            csv_writer.close()
+            print(f"📂 Données sauvegardées dans {csv_filename}")
+
+    print(f"✅ {stats['written']}/{total} produits écrits en {stats['batches']} lots ({stats['errors']} lots en erreur).")
+    return total
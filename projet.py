@@ -3,28 +3,52 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
+import math
+import itertools
+import queue
+import threading
 import pandas as pd
+import requests
 import mysql.connector
-from database import insert_into_mysql
+from extraction import extract_products_batch, record_page_metrics
+from waits import PageWaiter
+from fast_scraper import create_session, listing_url, parse_listing, parse_total_count, scrape_listing
+from pipeline import stream_to_storage
+from db_pool import print_pool_stats
+import columnar
+import metrics
+import browser
+from checkpoint import STATE_FILE, CrawlCheckpoint, retry_with_backoff
+from frontier import CrawlFrontier, discover_categories, load_categories
+import history
 
+BASE_URL = "https://www.decathlon.fr/nouveautes/nouveautes-homme"
 
-def close_cookie_banner(driver):
+# Tailles de page essayées (de la plus grande à la plus petite) par discover_pagination
+PAGE_SIZES = (120, 96, 80, 60, 48, 40)
+
+
+def create_driver():
     """
-    Attend que la bannière de cookies s'affiche et clique sur le bouton "Continuer sans accepter".
+    Instancie un WebDriver Edge (une session navigateur par appel).
+    """
+    options = webdriver.EdgeOptions()
+    options.add_argument("start-maximized")
+    return webdriver.Edge(options=options)
+
+
+class ProductGridMissing(Exception):
+    """
+    La grille de produits n'est pas apparue sur la page chargée.
     """
-    try:
-        bouton_cookie = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'Continuer sans accepter')]"))
-        )
-        bouton_cookie.click()
-        print("✅ Bannière cookies fermée.")
-    except Exception as e:
-        print("⚠ Impossible de fermer la bannière de cookies :", e)
 
 
 def scrape_products(driver):
     """
     Extrait les informations de chaque produit affiché sur la page.
+    Si la grille n'apparaît pas, ProductGridMissing est levée : la page est retentée puis marquée
+    en échec, sauf quand elle suit une page complète d'un catalogue de taille inconnue
+    (voir _iter_fetched_pages).
     """
     try:
         product_containers = WebDriverWait(driver, 10).until(
@@ -32,8 +56,22 @@ def scrape_products(driver):
         )
     except Exception as e:
         print("⚠ Impossible de trouver les produits :", e)
-        return []
+        raise ProductGridMissing(str(e)) from e
+
+    # Extraction de tous les champs en un seul execute_script
+    try:
+        with metrics.timer("scrape_extraction_seconds", backend="selenium"):
+            return extract_products_batch(driver)
+    except Exception as e:
+        print("⚠ Extraction groupée impossible, extraction élément par élément :", e)
+        with metrics.timer("scrape_extraction_seconds", backend="selenium-fallback"):
+            return scrape_product_containers(product_containers)
+
 
+def scrape_product_containers(product_containers):
+    """
+    Extraction élément par élément (plusieurs appels WebDriver par produit), utilisée en secours.
+    """
     data = []
     for container in product_containers:
         try:
@@ -75,31 +113,414 @@ def scrape_products(driver):
     return data
 
 
-def scrape_all_pages(driver, num_pages=12, page_size=40):
+def scrape_page(driver, page_num, page_size=40, waiter=None, base_url=BASE_URL):
+    """
+    Charge une page de résultats (paramètre 'from' calculé à partir du numéro de page) et en extrait les produits.
+    Le `waiter` (un par session navigateur) mémorise si la bannière cookies a déjà été traitée.
+    """
+    waiter = waiter or PageWaiter(driver)
+
+    # Calculer le paramètre 'from' pour naviguer dans les pages
+    with metrics.timer("scrape_page_load_seconds", backend="selenium"):
+        driver.get(listing_url(base_url, page_num, page_size))
+    # Attendre que la grille de produits soit chargée et stable
+    if not waiter.wait_for_products():
+        raise ProductGridMissing(f"grille de produits absente de la page {page_num + 1}")
+
+    # Fermer la bannière cookies (une seule fois par session)
+    waiter.close_cookie_banner()
+
+    # Scraper les produits de cette page
+    return scrape_products(driver)
+
+
+def discover_pagination(base_url=BASE_URL, page_sizes=PAGE_SIZES, default_size=40, driver=None):
+    """
+    Lit le nombre total de produits sur la première page et choisit la plus grande taille de page
+    acceptée par le site : celle dont la première page revient complète (ou contient tout le catalogue).
+    Les pages sont téléchargées en HTTP, ou chargées dans `driver` si le listing est rendu en JavaScript.
+    Renvoie (nombre total de produits ou None, taille de page).
+    """
+    session = create_session() if driver is None else None
+    waiter = PageWaiter(driver) if driver is not None else None
+    total = None
+    try:
+        for size in sorted(page_sizes, reverse=True):
+            url = listing_url(base_url, 0, size)
+            try:
+                if driver is None:
+                    response = session.get(url, timeout=15)
+                    response.raise_for_status()
+                    page_html, page_url = response.content, response.url
+                else:
+                    driver.get(url)
+                    waiter.wait_for_products()
+                    page_html, page_url = driver.page_source, url
+            except Exception as e:
+                print(f"⚠ Taille de page {size} : {e}")
+                continue
+            products = parse_listing(page_html, page_url)
+            if products is None:
+                print("ℹ Listing rendu en JavaScript : pagination par défaut.")
+                break
+            total = total or parse_total_count(page_html, len(products))
+            if products and len(products) >= min(size, total or size):
+                print(f"🔎 {total if total is not None else '?'} produits annoncés, pages de {size} produits.")
+                return total, size
+    finally:
+        if session is not None:
+            session.close()
+    return total, default_size
+
+
+def _page_numbers(num_pages):
+    return range(num_pages) if num_pages is not None else itertools.count()
+
+
+def _until_missing_grid(fetch, num_pages):
+    """
+    Enveloppe fetch(page_num) : avec num_pages=None, une page sans grille de produits après la première
+    vaut une page vide (au-delà de la dernière page) au lieu d'une erreur à retenter.
+    """
+    def fetch_page(page_num):
+        try:
+            return fetch(page_num)
+        except ProductGridMissing:
+            if num_pages is None and page_num > 0:
+                return []
+            raise
+    return fetch_page
+
+
+def _iter_fetched_pages(fetch, num_pages, page_size, checkpoint=None, retries=3):
+    """
+    Boucle commune des crawlers séquentiels : appelle fetch(page_num) avec nouvelles tentatives,
+    relit les pages présentes dans le `checkpoint` et s'arrête dès qu'une page est incomplète
+    (moins de `page_size` produits : fin du catalogue). Avec num_pages=None (nombre de pages inconnu),
+    le crawl s'arrête aussi à la première page définitivement en échec ; une page sans grille de produits
+    après une page complète y marque la fin du catalogue (pas de nouvelles tentatives).
+    """
+    fetch_page = _until_missing_grid(fetch, num_pages)
+    for page_num in _page_numbers(num_pages):
+        if checkpoint is not None and checkpoint.has(page_num):
+            products_data = checkpoint.products(page_num)
+            yield page_num, products_data
+        else:
+            try:
+                products_data = retry_with_backoff(lambda: fetch_page(page_num), retries=retries,
+                                                   description=f"Page {page_num + 1}")
+            except Exception as e:
+                metrics.inc("scrape_pages_failed_total")
+                if checkpoint is not None:
+                    checkpoint.mark_failed(page_num)
+                print(f"❌ Erreur lors du scraping de la page {page_num + 1}: {e}")
+                if num_pages is None:
+                    break
+                continue
+            record_page_metrics(products_data)
+            if checkpoint is not None:
+                checkpoint.save_page(page_num, products_data)
+            print(f"✅ Page {page_num + 1} scrappée ({len(products_data)} produits).")
+            yield page_num, products_data
+
+        if len(products_data) < page_size:
+            print(f"🏁 Page {page_num + 1} incomplète : fin du catalogue.")
+            break
+
+    if checkpoint is not None:
+        checkpoint.finish()
+
+
+def iter_pages(driver, num_pages=12, page_size=40, base_url=BASE_URL, waiter=None, checkpoint=None, retries=3):
+    """
+    Générateur : scrape les pages une par une avec Selenium et renvoie (numéro de page, produits)
+    au fur et à mesure, sans accumuler les résultats en mémoire.
+    Passer le `waiter` d'une session déjà préchauffée évite de retraiter la bannière cookies.
+    Une page en échec est retentée `retries` fois (backoff exponentiel) ; avec un `checkpoint`,
+    les pages déjà récupérées lors d'un passage interrompu sont relues au lieu d'être rechargées.
+    Le crawl s'arrête à la première page incomplète ; num_pages=None : pas de limite fixe.
+    """
+    owns_waiter = waiter is None
+    waiter = waiter or PageWaiter(driver)
+    yield from _iter_fetched_pages(
+        lambda page_num: scrape_page(driver, page_num, page_size, waiter, base_url),
+        num_pages, page_size, checkpoint, retries,
+    )
+    if owns_waiter:
+        waiter.print_summary()
+
+
+def scrape_all_pages(driver=None, num_pages=12, page_size=40):
     """
     Fonction pour scraper toutes les pages en fonction du nombre total de pages et du nombre d'articles par page.
+    Sans `driver`, la session légère partagée (headless, ressources bloquées, déjà préchauffée) est réutilisée.
     """
+    waiter = None
+    if driver is None:
+        driver, waiter = browser.shared_session(listing_url(BASE_URL, 0, page_size))
     all_data = []
-    for page_num in range(num_pages):
+    for _, products_data in iter_pages(driver, num_pages, page_size, waiter=waiter):
+        all_data.extend(products_data)  # Ajouter les résultats de chaque page
+    return all_data
+
+
+def iter_pages_http(num_pages=12, page_size=40, base_url=BASE_URL, driver_factory=create_driver,
+                    checkpoint=None, retries=3):
+    """
+    Générateur sans navigateur : chaque page est téléchargée via une session HTTP partagée et analysée avec lxml.
+    Un navigateur n'est démarré que si une page n'est exploitable qu'en JavaScript, ou si la requête HTTP
+    échoue (erreur réseau, réponse autre que 200) : la page est alors chargée avec Selenium.
+    Nouvelles tentatives, reprise sur `checkpoint` et arrêt sur page incomplète comme iter_pages.
+    """
+    session = create_session()
+    driver, waiter = None, None
+    html_ok = False
+
+    def scrape_with_browser(page_num, reason):
+        nonlocal driver, waiter
+        if driver is None:
+            print(f"⚠ {reason}, bascule sur Selenium.")
+            driver = driver_factory()
+            waiter = PageWaiter(driver)
+        return scrape_page(driver, page_num, page_size, waiter, base_url)
+
+    def fetch(page_num):
+        nonlocal html_ok
         try:
-            # Calculer le paramètre 'from' pour naviguer dans les pages
-            from_param = page_num * page_size
-            url = f"https://www.decathlon.fr/nouveautes/nouveautes-homme?from={from_param}&size={page_size}"
-            driver.get(url)
-            time.sleep(3)  # Attendre que la page charge
-
-            # Fermer la bannière cookies si présente
-            close_cookie_banner(driver)
-            time.sleep(2)
-
-            # Scraper les produits de cette page
-            products_data = scrape_products(driver)
-            if products_data:
-                all_data.extend(products_data)  # Ajouter les résultats de chaque page
-            print(f"✅ Page {page_num + 1} scrappée ({len(products_data)} produits).")
-        except Exception as e:
-            print(f"❌ Erreur lors du scraping de la page {page_num + 1}: {e}")
+            products_data = scrape_listing(session, listing_url(base_url, page_num, page_size))
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status == 404 and page_num > 0:
+                return []  # Au-delà de la dernière page
+            print(f"⚠ Page {page_num + 1} : réponse HTTP {status}.")
+            return scrape_with_browser(page_num, f"Réponse HTTP {status}")
+        except requests.RequestException as e:
+            print(f"⚠ Page {page_num + 1} : {e}")
+            return scrape_with_browser(page_num, "Requête HTTP en échec")
+        if products_data is None and html_ok:
+            # Les pages précédentes étaient exploitables en HTML : page vide, fin du catalogue
+            return []
+        html_ok = html_ok or products_data is not None
+        if products_data is None:
+            # Page rendue uniquement en JavaScript : on repasse par Selenium
+            products_data = scrape_with_browser(page_num, "Page rendue en JavaScript")
+        return products_data
+
+    try:
+        yield from _iter_fetched_pages(fetch, num_pages, page_size, checkpoint, retries)
+    finally:
+        session.close()
+        if driver is not None:
+            driver.quit()
 
+
+def scrape_all_pages_http(num_pages=12, page_size=40, base_url=BASE_URL, driver_factory=create_driver):
+    """
+    Version liste de iter_pages_http.
+    """
+    all_data = []
+    for _, products_data in iter_pages_http(num_pages, page_size, base_url, driver_factory):
+        all_data.extend(products_data)
+    return all_data
+
+
+class _PageScheduler:
+    """
+    Numéros de page partagés par les workers de iter_pages_parallel. Les pages sont distribuées une par
+    une, dans l'ordre, en sautant celles déjà présentes dans le checkpoint (`skip`). La distribution
+    s'arrête à `num_pages` s'il est connu, et après la première page incomplète (fin du catalogue) ;
+    avec num_pages=None, aussi après la première page définitivement en échec, comme le crawl séquentiel.
+    """
+
+    def __init__(self, num_pages=None):
+        self.num_pages = num_pages
+        self.end = num_pages  # Première page au-delà du catalogue (None : pas encore connue)
+        self.skip = set()
+        self._next = 0
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            while self._next in self.skip:
+                self._next += 1
+            if self._cancelled or (self.end is not None and self._next >= self.end):
+                return None
+            self._next += 1
+            return self._next - 1
+
+    def stop_after(self, page_num):
+        with self._lock:
+            if self.end is None or page_num + 1 < self.end:
+                self.end = page_num + 1
+
+    def beyond_end(self, page_num):
+        return self.end is not None and page_num >= self.end
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+
+    def expected_pages(self):
+        """
+        Pages à avoir récupérées : jusqu'à la fin du catalogue si elle est connue, sinon jusqu'à
+        la première page jamais distribuée (crawl interrompu ou navigateurs qui n'ont pas démarré).
+        """
+        if self.end is not None:
+            return range(self.end)
+        return range(max([self._next] + [p + 1 for p in self.skip]) + 1)
+
+
+def _crawl_worker(worker_id, driver_factory, scheduler, page_size, results, stats, retries=3):
+    """
+    Un worker = une session navigateur. Il demande des numéros de page au `scheduler` jusqu'à la fin
+    du catalogue et dépose (numéro de page, produits) dans la file `results`
+    (produits à None si la page a échoué). La bannière cookies n'est fermée qu'une seule fois par session.
+    """
+    nb_pages, nb_products = 0, 0
+    start = time.perf_counter()
+    driver, waiter = None, None
+    try:
+        driver = driver_factory()
+        waiter = PageWaiter(driver)
+        fetch = _until_missing_grid(lambda n: scrape_page(driver, n, page_size, waiter), scheduler.num_pages)
+        while True:
+            page_num = scheduler.next()
+            if page_num is None:
+                break
+            try:
+                products_data = retry_with_backoff(
+                    lambda: fetch(page_num),
+                    retries=retries, description=f"[worker {worker_id}] Page {page_num + 1}",
+                )
+                if len(products_data) < page_size:
+                    scheduler.stop_after(page_num)
+                record_page_metrics(products_data)
+                results.put((page_num, products_data))
+                nb_pages += 1
+                nb_products += len(products_data)
+                print(f"✅ [worker {worker_id}] Page {page_num + 1} scrappée ({len(products_data)} produits).")
+            except Exception as e:
+                if scheduler.num_pages is None:
+                    scheduler.stop_after(page_num)
+                results.put((page_num, None))
+                metrics.inc("scrape_pages_failed_total")
+                print(f"❌ [worker {worker_id}] Erreur lors du scraping de la page {page_num + 1}: {e}")
+    except Exception as e:
+        print(f"❌ [worker {worker_id}] Impossible de démarrer le navigateur : {e}")
+    finally:
+        if driver is not None:
+            driver.quit()
+            waiter.print_summary()
+        stats[worker_id] = {
+            "pages": nb_pages,
+            "products": nb_products,
+            "duration": time.perf_counter() - start,
+        }
+        results.put((None, worker_id))  # Fin du worker
+
+
+def print_throughput(stats, total_duration):
+    """
+    Affiche le débit (pages/s, produits/s) de chaque worker puis le débit total du crawl.
+    """
+    total_pages = sum(s["pages"] for s in stats.values())
+    total_products = sum(s["products"] for s in stats.values())
+    for worker_id in sorted(stats):
+        s = stats[worker_id]
+        duration = s["duration"] or 1e-9
+        print(f"📊 Worker {worker_id} : {s['pages']} pages, {s['products']} produits "
+              f"({s['pages'] / duration:.2f} pages/s, {s['products'] / duration:.2f} produits/s)")
+    duration = total_duration or 1e-9
+    print(f"📊 Total : {total_pages} pages, {total_products} produits en {total_duration:.1f}s "
+          f"({total_pages / duration:.2f} pages/s, {total_products / duration:.2f} produits/s)")
+
+
+def iter_pages_parallel(num_pages=12, page_size=40, num_workers=4, driver_factory=create_driver,
+                        checkpoint=None, retries=3):
+    """
+    Version concurrente de iter_pages : un pool de `num_workers` sessions navigateur se partage
+    les numéros de page (_PageScheduler). Les pages sont renvoyées dans l'ordre dès qu'elles sont disponibles
+    (les pages en échec après `retries` nouvelles tentatives sont sautées). Avec un `checkpoint`,
+    seules les pages absentes du fichier d'état sont distribuées aux workers.
+    Avec num_pages=None, les pages sont distribuées une par une jusqu'à ce qu'une page revienne incomplète ;
+    les pages déjà demandées au-delà de la fin du catalogue sont ignorées.
+    """
+    scheduler, pending = _PageScheduler(num_pages), {}
+    if checkpoint is not None:
+        for page_num in checkpoint.page_nums():
+            if scheduler.beyond_end(page_num):
+                continue
+            pending[page_num] = checkpoint.products(page_num)
+            scheduler.skip.add(page_num)
+            if len(pending[page_num]) < page_size:
+                scheduler.stop_after(page_num)
+
+    if scheduler.end is not None:
+        num_workers = min(num_workers, len(set(scheduler.expected_pages()) - scheduler.skip))
+    # File de résultats bornée : les workers attendent si l'écriture prend du retard
+    results, stats = queue.Queue(maxsize=max(1, num_workers * 2)), {}
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=_crawl_worker,
+                         args=(i + 1, driver_factory, scheduler, page_size, results, stats, retries), daemon=True)
+        for i in range(num_workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Tampon de réordonnancement : on ne renvoie une page que lorsque toutes les précédentes sont arrivées
+    next_page, workers_done = 0, 0
+    try:
+        while workers_done < num_workers:
+            page_num, products_data = results.get()
+            if page_num is None:
+                workers_done += 1
+                continue
+            if scheduler.beyond_end(page_num):
+                continue  # Page demandée avant que la fin du catalogue soit connue
+            if checkpoint is not None:
+                if products_data is None:
+                    checkpoint.mark_failed(page_num)
+                else:
+                    checkpoint.save_page(page_num, products_data)
+            pending[page_num] = products_data
+            while next_page in pending:
+                products_data = pending.pop(next_page)
+                if products_data is not None and not scheduler.beyond_end(next_page):
+                    yield next_page, products_data
+                next_page += 1
+    finally:
+        # Crawl interrompu (erreur d'écriture, Ctrl-C) : pages restantes abandonnées, et la file de
+        # résultats est vidée pour que chaque worker termine sa page en cours et ferme son navigateur
+        scheduler.cancel()
+        while workers_done < num_workers:
+            if results.get()[0] is None:
+                workers_done += 1
+
+    # Pages restantes (si une page n'a jamais été traitée, par exemple à cause d'un navigateur qui n'a pas démarré)
+    for page_num in sorted(pending):
+        if pending[page_num] is not None and not scheduler.beyond_end(page_num):
+            yield page_num, pending[page_num]
+
+    for thread in threads:
+        thread.join()
+    if checkpoint is not None:
+        # Pages jamais enregistrées (en échec ou jamais traitées) : à reprendre au prochain passage
+        for page_num in scheduler.expected_pages():
+            if not checkpoint.has(page_num):
+                checkpoint.mark_failed(page_num)
+        checkpoint.finish()
+    print_throughput(stats, time.perf_counter() - start)
+
+
+def scrape_all_pages_parallel(num_pages=12, page_size=40, num_workers=4, driver_factory=create_driver):
+    """
+    Version liste de iter_pages_parallel : les résultats sont fusionnés dans l'ordre des pages.
+    """
+    all_data = []
+    for _, products_data in iter_pages_parallel(num_pages, page_size, num_workers, driver_factory):
+        all_data.extend(products_data)
     return all_data
 
 
@@ -115,33 +536,123 @@ def save_to_csv(data, filename="products.csv"):
         print("❌ Erreur lors de la sauvegarde dans le CSV :", e)
 
 
-def main():
-    # Instanciation du WebDriver Edge
-    options = webdriver.EdgeOptions()
-    options.add_argument("start-maximized")
-    driver = webdriver.Edge(options=options)
+def _collect(pages, products):
+    """
+    Laisse passer les pages vers l'écriture en gardant aussi leurs produits dans `products`.
+    """
+    for page_num, products_data in pages:
+        products.extend(products_data or [])
+        yield page_num, products_data
 
-    # Scraper tous les produits de toutes les pages
-    print("🔄 Démarrage du scraping multi-pages...")
-    products_data = scrape_all_pages(driver, num_pages=12, page_size=40)  # On récupère toutes les pages
 
-    if products_data:
-        df = pd.DataFrame(products_data)
-        print(df)
+def scraped_frame(products):
+    """
+    Produits scrappés sous forme de DataFrame typé (mêmes colonnes que la table `produits`), une ligne
+    par clé produit comme dans MySQL (la dernière observation l'emporte).
+    """
+    df = columnar.records_to_table(products).to_pandas()
+    keyed = df["product_key"].notna()
+    return pd.concat([df[keyed].drop_duplicates("product_key", keep="last"), df[~keyed]], ignore_index=True)
+
+
+def resolve_categories(categories_file=None, discover_url=None, prefixes=None):
+    """
+    Catégories à crawler : lues dans un fichier et/ou découvertes sur une page ; None si aucune.
+    """
+    categories = []
+    if categories_file:
+        categories += load_categories(categories_file)
+    if discover_url:
+        categories += discover_categories(discover_url, prefixes)
+    return categories or None
 
-        # Sauvegarder en CSV
-        save_to_csv(products_data)
 
-        # 🔥 Insérer les données dans MySQL
-        insert_into_mysql(products_data)
+def main(num_workers=1, use_browser=False, lean=False, state_file=STATE_FILE, restart=False, keep=False,
+         categories=None):
+    """
+    Scrape toutes les pages : les produits sont écrits (CSV + MySQL) au fil de l'eau, page par page.
+    Avec keep=True, renvoie aussi les produits en DataFrame (pour enchaîner le nettoyage sans relire MySQL).
+    Avec une liste de `categories` (URLs de listing), le crawl passe par la frontière multi-catégories
+    (frontier.py) : `num_workers` workers HTTP, débit limité par hôte, produits dédoublonnés.
+    """
+    print("🔄 Démarrage du scraping multi-pages...")
+    driver, crawl = None, None
+    # Profil léger : headless, images/polices/trackers bloqués, profil persistant (un par session)
+    driver_factory = browser.lean_driver_factory("edge") if lean else create_driver
+    if use_browser and num_workers <= 1 and not categories:
+        # Instanciation du WebDriver Edge
+        driver = driver_factory()
 
+    if categories:
+        # Plusieurs catégories : frontière de crawl (workers HTTP, débit limité par hôte, produits dédoublonnés)
+        crawl = CrawlFrontier(categories, num_workers=num_workers)
+        pages = crawl.iter_pages()
     else:
-        print("❌ Aucun produit trouvé.")
+        # Nombre de produits et taille de page lus sur le site (au lieu de 12 pages de 40)
+        total, page_size = discover_pagination(driver=driver)
+        num_pages = math.ceil(total / page_size) if total else None
 
-    # Fermer le navigateur
-    time.sleep(5)
-    driver.quit()
+        # Fichier d'état : un crawl interrompu reprend là où il s'était arrêté
+        checkpoint = CrawlCheckpoint(state_file, BASE_URL, page_size=page_size, restart=restart)
+        if not use_browser:
+            # Chemin rapide HTTP + lxml (Selenium seulement si la page l'exige)
+            pages = iter_pages_http(num_pages, page_size, driver_factory=driver_factory, checkpoint=checkpoint)
+        elif num_workers > 1:
+            # Crawl concurrent : chaque worker ouvre sa propre session navigateur
+            # (sans total annoncé, les pages sont distribuées jusqu'à la première page incomplète)
+            pages = iter_pages_parallel(num_pages, page_size, num_workers=num_workers,
+                                        driver_factory=driver_factory, checkpoint=checkpoint)
+        else:
+            pages = iter_pages(driver, num_pages, page_size, checkpoint=checkpoint)
+
+    try:
+        # Passage enregistré dans `scrape_runs` : l'historique des prix ne garde que ce qui a changé
+        run_key = columnar.new_run_id()
+        try:
+            run_id = history.start_run(run_key)
+        except mysql.connector.Error as e:
+            print("⚠ Passage non enregistré dans l'historique :", e)
+            run_id = None
+        products = []
+        if keep:
+            pages = _collect(pages, products)
+        # 🔥 Écriture en CSV, en Parquet et dans MySQL par lots, pendant le chargement des pages suivantes
+        total = stream_to_storage(pages, csv_filename="products.csv", parquet_dir=columnar.RAW_DIR, run_id=run_key)
+        if crawl is not None:
+            try:
+                crawl.save_mapping()
+            except mysql.connector.Error as e:
+                print("❌ Erreur lors de l'enregistrement des catégories :", e)
+        if run_id is not None:
+            try:
+                history.finish_run(run_id, total)
+            except mysql.connector.Error as e:
+                print("❌ Erreur lors de la mise à jour de l'historique :", e)
+        if not total:
+            print("❌ Aucun produit trouvé.")
+        else:
+            print_pool_stats()
+    finally:
+        # Fermer le navigateur
+        if driver is not None:
+            driver.quit()
+    return scraped_frame(products) if keep else None
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Scraping des nouveautés homme Decathlon")
+    parser.add_argument("--browser", action="store_true", help="forcer le scraping via Selenium")
+    parser.add_argument("--workers", type=int, default=1, help="nombre de sessions navigateur en parallèle")
+    parser.add_argument("--lean", action="store_true", help="navigateur headless, ressources bloquées, profil persistant")
+    parser.add_argument("--state", default=STATE_FILE, help="fichier d'état pour la reprise du crawl")
+    parser.add_argument("--restart", action="store_true", help="ignorer le fichier d'état et tout recharger")
+    parser.add_argument("--categories", help="fichier d'URLs de catégories (une par ligne) à crawler")
+    parser.add_argument("--discover", help="page dont les liens de catégories sont à crawler")
+    parser.add_argument("--prefix", action="append", help="préfixe de chemin des catégories découvertes")
+    args = parser.parse_args()
+    try:
+        main(num_workers=args.workers, use_browser=args.browser, lean=args.lean, state_file=args.state,
+             restart=args.restart, categories=resolve_categories(args.categories, args.discover, args.prefix))
+    finally:
+        metrics.export("scrape")
@@ -0,0 +1,156 @@
+"""
+Rapport en mode batch : tous les graphiques de data_visualization sont rendus sans affichage
+(backend Agg) en PNG et SVG, en parallèle dans un pool de processus, avec une page index.html.
+
+Chaque figure est mise en cache sur disque sous un hash de ses données d'entrée (et du code de
+la fonction qui la dessine) : si le catalogue n'a pas changé, rien n'est redessiné.
+"""
+import os
+os.environ.setdefault("MPLBACKEND", "Agg")  # Hérité par les processus du pool
+
+import hashlib
+import html
+import inspect
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use("Agg")
+import pandas as pd
+import data_visualization
+from aggregations import load_report_data, report_data_from_frame
+import metrics
+
+FORMATS = ("png", "svg")
+
+# Agrégations utilisées par chaque graphique (seules celles-ci entrent dans le hash du cache)
+PLOT_INPUTS = {
+    "plot_price_distribution": ("price_histogram", "top_expensive"),
+    "plot_products_per_brand": ("brand_counts",),
+    "plot_price_boxplot": ("brand_price_quantiles",),
+    "plot_rating_distribution": ("rating_histogram",),
+    "plot_price_vs_rating": ("price_rating_grid", "top_rated"),
+    "plot_shipping_distribution": ("shipping_shares",),
+}
+
+
+def input_hash(plot_name, data):
+    """
+    Hash des données d'entrée d'un graphique et du code source de la fonction qui le dessine.
+    """
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(getattr(data_visualization, plot_name)).encode())
+    for key in PLOT_INPUTS[plot_name]:
+        df = data[key]
+        digest.update(key.encode())
+        digest.update("|".join(map(str, df.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def render_figure(plot_name, data, paths):
+    """
+    Exécuté dans un processus du pool : dessine une figure et l'enregistre dans chaque format.
+    Les fichiers sont écrits sous un nom temporaire puis renommés (jamais de fichier à moitié écrit dans le cache).
+    """
+    import matplotlib.pyplot as plt
+    fig = getattr(data_visualization, plot_name)(data)
+    for path in paths:
+        tmp_path = f"{path}.tmp"
+        fig.savefig(tmp_path, format=path.rsplit(".", 1)[1], bbox_inches="tight")
+        os.replace(tmp_path, path)
+    plt.close(fig)
+    return plot_name
+
+
+def write_index(output_dir, data, plot_names):
+    """
+    Page index.html : statistiques globales puis tous les graphiques.
+    """
+    sections = "\n".join(
+        f'<h2>{html.escape(name)}</h2>\n<a href="{name}.svg"><img src="{name}.png" alt="{html.escape(name)}"></a>'
+        for name in plot_names
+    )
+    page = f"""<!DOCTYPE html>
+<html lang="fr">
+<head><meta charset="utf-8"><title>Rapport produits Decathlon</title></head>
+<body>
+<h1>Rapport produits Decathlon</h1>
+<p>Généré le {time.strftime("%Y-%m-%d %H:%M:%S")}</p>
+{data["summary"].T.to_html(header=False)}
+{sections}
+</body>
+</html>
+"""
+    with open(os.path.join(output_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(page)
+
+
+def build_report(output_dir="rapports", data=None, max_workers=None):
+    """
+    Génère le rapport complet dans `output_dir`. Les figures dont les données n'ont pas changé
+    sont reprises du cache (`output_dir/cache`). Renvoie (figures redessinées, figures en cache).
+    """
+    start = time.perf_counter()
+    cache_dir = os.path.join(output_dir, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    data = data if data is not None else load_report_data()
+
+    to_render, cached = {}, []
+    cache_paths = {}
+    for plot_name in PLOT_INPUTS:
+        key = input_hash(plot_name, data)
+        cache_paths[plot_name] = [os.path.join(cache_dir, f"{plot_name}-{key}.{fmt}") for fmt in FORMATS]
+        if all(os.path.exists(path) for path in cache_paths[plot_name]):
+            cached.append(plot_name)
+        else:
+            to_render[plot_name] = cache_paths[plot_name]
+
+    if to_render:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(render_figure, plot_name, {k: data[k] for k in PLOT_INPUTS[plot_name]}, paths)
+                for plot_name, paths in to_render.items()
+            ]
+            for future in futures:
+                print(f"🖼 {future.result()} rendu.")
+
+    # Les anciennes versions des figures ne servent plus : je les retire du cache
+    current = {os.path.basename(path) for paths in cache_paths.values() for path in paths}
+    for filename in os.listdir(cache_dir):
+        if filename not in current:
+            os.remove(os.path.join(cache_dir, filename))
+
+    # Copie des figures (cache -> dossier du rapport) et page d'index
+    for plot_name, paths in cache_paths.items():
+        for path, fmt in zip(paths, FORMATS):
+            shutil.copyfile(path, os.path.join(output_dir, f"{plot_name}.{fmt}"))
+    write_index(output_dir, data, list(PLOT_INPUTS))
+
+    duration = time.perf_counter() - start
+    metrics.observe("report_duration_seconds", duration)
+    metrics.inc("report_figures_total", len(to_render), status="rendered")
+    metrics.inc("report_figures_total", len(cached), status="cached")
+    print(f"✅ Rapport généré dans {output_dir}/index.html en {duration:.2f}s "
+          f"({len(to_render)} figures redessinées, {len(cached)} reprises du cache).")
+    return list(to_render), cached
+
+
+def main(output_dir="rapports", max_workers=None, df=None):
+    """
+    Rapport à partir de MySQL (agrégations SQL), ou du DataFrame nettoyé `df` s'il est déjà en mémoire.
+    """
+    data = report_data_from_frame(df) if df is not None else None
+    return build_report(output_dir, data=data, max_workers=max_workers)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Rapport des produits en mode batch (sans affichage)")
+    parser.add_argument("--output", default="rapports", help="dossier de sortie du rapport")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus de rendu")
+    args = parser.parse_args()
+    try:
+        main(args.output, max_workers=args.workers)
+    finally:
+        metrics.export("report")
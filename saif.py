@@ -2,22 +2,14 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
 import pandas as pd
+from extraction import extract_products_batch
+from waits import PageWaiter
+from fast_scraper import create_session, scrape_listing
+import columnar
+import browser
 
-
-def close_cookie_banner(driver):
-    """
-    Attend que la bannière de cookies s'affiche et clique sur le bouton "Continuer sans accepter".
-    """
-    try:
-        bouton_cookie = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'Continuer sans accepter')]"))
-        )
-        bouton_cookie.click()
-        print("Bannière cookies fermée.")
-    except Exception as e:
-        print("Impossible de fermer la bannière de cookies :", e)
+URL = "https://www.decathlon.fr/nouveautes/nouveautes-homme"
 
 
 def scrape_products(driver):
@@ -40,6 +32,18 @@ def scrape_products(driver):
         print("Impossible de trouver les produits :", e)
         return []
 
+    try:
+        # Extraction de tous les champs de tous les produits en un seul appel
+        return extract_products_batch(driver, default_rating="", default_shipping="")
+    except Exception as e:
+        print("Extraction groupée impossible, extraction élément par élément :", e)
+        return scrape_product_containers(product_containers)
+
+
+def scrape_product_containers(product_containers):
+    """
+    Extraction élément par élément (chemin de secours si le script d'extraction échoue).
+    """
     data = []
     for container in product_containers:
         try:
@@ -102,33 +106,65 @@ def save_to_csv(data, filename="products.csv"):
         print("Erreur lors de la sauvegarde dans le CSV :", e)
 
 
-def main():
+def save_to_parquet(data):
+    """
+    Sauvegarde la liste des produits au format Parquet (une partition par passage de scraping).
+    """
+    try:
+        path = columnar.write_run(data)
+        print("Données sauvegardées dans", path)
+    except Exception as e:
+        print("Erreur lors de la sauvegarde en Parquet :", e)
+
+
+def scrape_with_browser(url=URL, lean=True):
+    """
+    Ouvre la page dans Chrome, ferme la bannière cookies et extrait les produits.
+    Avec `lean`, Chrome tourne sans fenêtre, sans images ni trackers, avec un profil persistant.
+    """
     # Instanciation du WebDriver (assurez-vous que le driver Chrome est installé et accessible)
-    driver = webdriver.Chrome()
+    driver = browser.create_lean_driver("chrome", profile_dir=f"{browser.PROFILE_DIR}/chrome-saif") if lean else webdriver.Chrome()
 
     # Ouvrir la page des nouveautés pour homme sur Decathlon
-    driver.get("https://www.decathlon.fr/nouveautes/nouveautes-homme")
-    time.sleep(3)  # Attendre le chargement de la page
+    driver.get(url)
+    waiter = PageWaiter(driver)
+    waiter.wait_for_products()  # Attendre que la grille de produits soit chargée
 
     # Fermer la bannière de cookies
-    close_cookie_banner(driver)
-    time.sleep(3)
+    waiter.close_cookie_banner()
 
     # Extraire les informations des produits
     products_data = scrape_products(driver)
+    waiter.print_summary()
+    driver.quit()
+    return products_data
+
+
+def main():
+    # On tente d'abord le chemin rapide sans navigateur (HTTP + lxml)
+    session = create_session()
+    try:
+        products_data = scrape_listing(session, URL, default_rating="", default_shipping="")
+    except Exception as e:
+        print("Téléchargement direct impossible :", e)
+        products_data = None
+    finally:
+        session.close()
+
+    if products_data is None:
+        # La page n'est exploitable qu'en JavaScript : on passe par Chrome
+        products_data = scrape_with_browser()
+
     if products_data:
         # Afficher le DataFrame sous forme de tableau dans la console
         df = pd.DataFrame(products_data)
         print(df)
-        # Sauvegarder dans un fichier CSV
+        # Sauvegarder dans un fichier CSV et en Parquet
         save_to_csv(products_data)
+        save_to_parquet(products_data)
     else:
         print("Aucun produit trouvé.")
 
-    # Attendre quelques secondes avant de fermer le navigateur
-    time.sleep(5)
-    driver.quit()
-
 
 if __name__ == "__main__":
     main()
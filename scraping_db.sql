@@ -2,16 +2,102 @@ CREATE DATABASE IF NOT EXISTS scraping_db;
 
 USE scraping_db;
 
+-- Le schéma est maintenu par les migrations versionnées de migrations.py, appliquées automatiquement
+-- au démarrage (création du pool de connexions). Les tables ci-dessous correspondent à la dernière version.
+
 CREATE TABLE IF NOT EXISTS produits (
     id INT AUTO_INCREMENT PRIMARY KEY,
+    product_key VARCHAR(64),
+    marque VARCHAR(255),
+    nom_produit VARCHAR(255),
+    lien TEXT,
+    prix DECIMAL(10,2),
+    rating INT NOT NULL DEFAULT 0,
+    infos_livraison VARCHAR(255),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_produits_product_key (product_key),
+    KEY idx_produits_updated_at (updated_at),
+    KEY idx_produits_marque (marque),
+    KEY idx_produits_livraison (infos_livraison)
+);
+
+CREATE TABLE IF NOT EXISTS produits_clean (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    product_key VARCHAR(64),
+    canonical_id VARCHAR(64),
     marque VARCHAR(255),
     nom_produit VARCHAR(255),
     lien TEXT,
-    prix VARCHAR(50),
-    rating VARCHAR(50),
+    prix DECIMAL(10,2),
+    rating INT NOT NULL DEFAULT 0,
+    infos_livraison VARCHAR(255) DEFAULT 'non spécifié',
+    UNIQUE KEY uq_produits_clean_product_key (product_key),
+    KEY idx_produits_clean_marque_prix (marque, prix),
+    KEY idx_produits_clean_prix (prix),
+    KEY idx_produits_clean_livraison (infos_livraison),
+    KEY idx_produits_clean_canonical (canonical_id)
+);
+
+CREATE TABLE IF NOT EXISTS scrape_runs (
+    run_id INT AUTO_INCREMENT PRIMARY KEY,
+    run_key VARCHAR(32),
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    nb_products INT NOT NULL DEFAULT 0,
+    nb_changes INT NOT NULL DEFAULT 0
+);
+
+-- Une ligne par changement de prix / rating / livraison, partitions mensuelles (history.ensure_partitions)
+CREATE TABLE IF NOT EXISTS produits_historique (
+    product_key VARCHAR(64) NOT NULL,
+    observed_at DATETIME NOT NULL,
+    run_id INT NOT NULL,
+    prix DECIMAL(10,2),
+    rating INT NOT NULL DEFAULT 0,
+    infos_livraison VARCHAR(255),
+    PRIMARY KEY (product_key, observed_at),
+    KEY idx_produits_historique_run (run_id)
+)
+PARTITION BY RANGE COLUMNS (observed_at) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+CREATE TABLE IF NOT EXISTS produits_dernier_etat (
+    product_key VARCHAR(64) PRIMARY KEY,
+    run_id INT NOT NULL,
+    prix DECIMAL(10,2),
+    rating INT NOT NULL DEFAULT 0,
     infos_livraison VARCHAR(255)
 );
 
+CREATE TABLE IF NOT EXISTS categories (
+    category_id INT AUTO_INCREMENT PRIMARY KEY,
+    url VARCHAR(500) NOT NULL,
+    last_crawled_at DATETIME NULL,
+    UNIQUE KEY uq_categories_url (url)
+);
+
+-- Un produit peut apparaître dans plusieurs catégories (frontier.py)
+CREATE TABLE IF NOT EXISTS categories_produits (
+    category_id INT NOT NULL,
+    product_key VARCHAR(64) NOT NULL,
+    position INT NOT NULL DEFAULT 0,
+    seen_at DATETIME NOT NULL,
+    PRIMARY KEY (category_id, product_key),
+    KEY idx_categories_produits_product (product_key)
+);
+
+-- Champs lus sur les fiches produit (enrichment.py)
+CREATE TABLE IF NOT EXISTS produits_details (
+    product_key VARCHAR(64) PRIMARY KEY,
+    note_moyenne DECIMAL(3,2),
+    nb_avis INT,
+    tailles VARCHAR(255),
+    tailles_en_stock VARCHAR(255),
+    en_stock TINYINT(1),
+    fetched_at DATETIME NOT NULL
+);
+
 SELECT * FROM produits;
 describe produits; 
 
@@ -19,3 +105,4 @@ SELECT * FROM produits_clean ;
 
 describe produits_clean;
 
+SELECT * FROM schema_migrations;
@@ -0,0 +1,107 @@
+"""
+Attentes conditionnelles pour le scraping (remplacent les time.sleep fixes).
+
+Un PageWaiter est associé à une session navigateur : il attend que la grille de produits soit
+présente et stable, ne s'occupe de la bannière cookies qu'une seule fois par session et
+enregistre la durée réelle de chaque attente.
+"""
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+import metrics
+
+COOKIE_BUTTON_XPATH = "//span[contains(text(), 'Continuer sans accepter')]"
+
+
+class product_grid_stable:
+    """
+    Condition WebDriverWait : les conteneurs `dpb-holder` sont présents et leur nombre
+    n'a pas changé pendant `stable_polls` interrogations consécutives.
+    """
+
+    def __init__(self, stable_polls=2):
+        self.stable_polls = stable_polls
+        self.last_count = -1
+        self.same_count = 0
+
+    def __call__(self, driver):
+        count = len(driver.find_elements(By.CLASS_NAME, "dpb-holder"))
+        if count and count == self.last_count:
+            self.same_count += 1
+        else:
+            self.same_count = 0
+        self.last_count = count
+        return count if self.same_count >= self.stable_polls else False
+
+
+class PageWaiter:
+    """
+    Gère les attentes d'une session navigateur et mémorise l'état du consentement cookies.
+    """
+
+    def __init__(self, driver, poll_frequency=0.2):
+        self.driver = driver
+        self.poll_frequency = poll_frequency
+        self.cookies_handled = False
+        self.timings = []  # liste de (nom de l'attente, durée en secondes)
+
+    def _record(self, name, start):
+        duration = time.perf_counter() - start
+        self.timings.append((name, duration))
+        metrics.observe("scrape_wait_seconds", duration, wait=name)
+        return duration
+
+    def wait_for_products(self, timeout=10, stable_polls=2):
+        """
+        Bloque jusqu'à ce que la grille de produits soit présente et stable.
+        Renvoie le nombre de produits (0 si la grille n'apparaît pas avant `timeout`).
+        """
+        start = time.perf_counter()
+        try:
+            count = WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(
+                product_grid_stable(stable_polls)
+            )
+        except TimeoutException:
+            count = 0
+        self._record("products", start)
+        return count
+
+    def close_cookie_banner(self, timeout=3):
+        """
+        Ferme la bannière cookies au premier appel de la session ; les appels suivants ne font rien.
+        La grille étant déjà chargée, la bannière est soit déjà là, soit absente : on n'attend
+        donc que `timeout` secondes au maximum.
+        """
+        if self.cookies_handled:
+            return
+        start = time.perf_counter()
+        try:
+            bouton_cookie = WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(
+                EC.element_to_be_clickable((By.XPATH, COOKIE_BUTTON_XPATH))
+            )
+            bouton_cookie.click()
+            print("✅ Bannière cookies fermée.")
+        except TimeoutException:
+            print("ℹ Pas de bannière cookies pour cette session.")
+        except WebDriverException as e:
+            # Bannière recouverte, retirée ou rechargée entre l'attente et le clic : le scraping continue
+            print(f"⚠ Bannière cookies non fermée : {e.msg or type(e).__name__}")
+        finally:
+            self.cookies_handled = True
+            self._record("cookies", start)
+
+    def summary(self):
+        """
+        Renvoie {nom: (nombre d'attentes, durée totale, durée max)} pour les attentes enregistrées.
+        """
+        result = {}
+        for name, duration in self.timings:
+            count, total, longest = result.get(name, (0, 0.0, 0.0))
+            result[name] = (count + 1, total + duration, max(longest, duration))
+        return result
+
+    def print_summary(self):
+        for name, (count, total, longest) in self.summary().items():
+            print(f"⏱ Attente '{name}' : {count} fois, {total:.2f}s au total (max {longest:.2f}s)")